@@ -1,5 +1,18 @@
 import { type NextRequest, NextResponse } from "next/server"
 import { createClient } from "@/lib/supabase/server"
+import { callSolver, streamSolverOption } from "@/lib/timetable-solver"
+
+// The solver runs as a local worker process
+export const runtime = "nodejs"
+
+// Entries are exported from the solver and written to the database this many at a time
+const ENTRY_CHUNK_SIZE = 500
+
+// The solver answers one request at a time, so every solve is bounded: the options share
+// three quarters of the request timeout, leaving the rest for loading and packing them
+const NUM_OPTIONS = 3
+const SOLVER_TIMEOUT_MS = 120000
+const OPTION_TIME_LIMIT_SECONDS = (SOLVER_TIMEOUT_MS * 0.75) / 1000 / NUM_OPTIONS
 
 export async function POST(request: NextRequest) {
   try {
@@ -25,7 +38,7 @@ export async function POST(request: NextRequest) {
     const { department_id, academic_year, semester, name } = body
 
     // Fetch all required data for timetable generation
-    const [timeSlots, classrooms, subjects, faculty, batches, constraints] = await Promise.all([
+    const [timeSlots, classrooms, subjects, faculty, batches, constraints, previousTimetable] = await Promise.all([
       supabase.from("time_slots").select("*").order("day_of_week, slot_number"),
       supabase.from("classrooms").select("*").eq("is_available", true).order("name"),
       supabase.from("subjects").select("*").eq("department_id", department_id).order("name"),
@@ -46,6 +59,15 @@ export async function POST(request: NextRequest) {
         .eq("department_id", department_id)
         .eq("semester", semester),
       supabase.from("scheduling_constraints").select("*").eq("is_active", true),
+      // The department's latest approved timetable is a warm start: the search tries its placements first
+      supabase
+        .from("timetables")
+        .select("timetable_entries(time_slot_id, subject_id, faculty_id, classroom_id, batch_id, class_type)")
+        .eq("department_id", department_id)
+        .in("status", ["approved", "active", "archived"])
+        .order("created_at", { ascending: false })
+        .limit(1)
+        .maybeSingle(),
     ])
 
     // Transform data for the Python algorithm
@@ -101,12 +123,37 @@ export async function POST(request: NextRequest) {
         type: constraint.type,
         weight: constraint.weight,
         description: constraint.description,
+        parameters: constraint.parameters || {},
       })),
     }
 
-    // For now, return a mock response since we can't execute Python directly
-    // In a real implementation, you would call the Python script or implement the algorithm in TypeScript
-    const mockTimetableOptions = generateMockTimetableOptions(algorithmData, department_id)
+    // Solve with the persistent Python worker; unchanged data reuses its cached problem.
+    // Only option summaries come back; the best option's entries are streamed in chunks below.
+    let timetableOptions: any[]
+    let bestEntryChunks: AsyncIterable<any[]>
+    let feasibilityIssues: any[] = []
+    try {
+      const result = await callSolver<{ problem_key: string; options: any[]; feasibility: { issues: any[] } }>(
+        "generate",
+        {
+          data: algorithmData,
+          department_id,
+          semester,
+          num_options: NUM_OPTIONS,
+          time_limit: OPTION_TIME_LIMIT_SECONDS,
+          warm_start: previousTimetable.data?.timetable_entries || [],
+        },
+        SOLVER_TIMEOUT_MS,
+      )
+      timetableOptions = result.options
+      feasibilityIssues = result.feasibility.issues
+      bestEntryChunks = streamSolverOption(result.problem_key, timetableOptions[0].option_id, ENTRY_CHUNK_SIZE)
+    } catch (error) {
+      console.error("Timetable solver unavailable, using mock options:", error)
+      const mockOptions = generateMockTimetableOptions(algorithmData, department_id)
+      timetableOptions = mockOptions.map(({ entries, ...summary }) => ({ ...summary, entry_count: entries.length }))
+      bestEntryChunks = chunkEntries(mockOptions[0].entries, ENTRY_CHUNK_SIZE)
+    }
 
     // Create timetable record
     const { data: timetable, error: timetableError } = await supabase
@@ -126,23 +173,40 @@ export async function POST(request: NextRequest) {
       throw timetableError
     }
 
-    // Store the best timetable option
-    const bestOption = mockTimetableOptions[0]
-    const timetableEntries = bestOption.entries.map((entry: any) => ({
-      timetable_id: timetable.id,
-      ...entry,
-    }))
+    // Store the best timetable option, one bulk insert per exported chunk
+    for await (const entries of bestEntryChunks) {
+      const { error: entriesError } = await supabase.from("timetable_entries").insert(
+        entries.map((entry) => ({
+          timetable_id: timetable.id,
+          ...entry,
+        })),
+      )
 
-    const { error: entriesError } = await supabase.from("timetable_entries").insert(timetableEntries)
+      if (entriesError) {
+        throw entriesError
+      }
+    }
 
-    if (entriesError) {
-      throw entriesError
+    // Record why the timetable cannot be complete, for the conflicts page
+    if (feasibilityIssues.length > 0) {
+      const { error: conflictsError } = await supabase.from("timetable_conflicts").insert(
+        feasibilityIssues.map((issue) => ({
+          timetable_id: timetable.id,
+          conflict_type: issue.conflict_type,
+          description: issue.description,
+          severity: issue.severity,
+        })),
+      )
+
+      if (conflictsError) {
+        throw conflictsError
+      }
     }
 
     return NextResponse.json({
       success: true,
       timetable_id: timetable.id,
-      options: mockTimetableOptions,
+      options: timetableOptions,
       message: "Timetable generated successfully",
     })
   } catch (error) {
@@ -151,6 +215,12 @@ export async function POST(request: NextRequest) {
   }
 }
 
+async function* chunkEntries(entries: any[], chunkSize: number) {
+  for (let start = 0; start < entries.length; start += chunkSize) {
+    yield entries.slice(start, start + chunkSize)
+  }
+}
+
 function generateMockTimetableOptions(data: any, departmentId: string) {
   // Mock implementation - in reality, this would call the Python algorithm
   const options = []
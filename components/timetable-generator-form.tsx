@@ -25,9 +25,10 @@ interface TimetableGeneratorFormProps {
 }
 
 interface TimetableOption {
+  option_id?: string
   option_number: number
   fitness_score: number
-  entries: any[]
+  entry_count: number
   conflicts: number
   suggestions: string[]
 }
@@ -266,7 +267,7 @@ export function TimetableGeneratorForm({ departments }: TimetableGeneratorFormPr
                 <CardContent>
                   <div className="grid grid-cols-1 md:grid-cols-3 gap-4 mb-4">
                     <div className="text-center">
-                      <div className="text-2xl font-bold text-blue-600">{option.entries.length}</div>
+                      <div className="text-2xl font-bold text-blue-600">{option.entry_count}</div>
                       <div className="text-sm text-muted-foreground">Total Classes</div>
                     </div>
                     <div className="text-center">
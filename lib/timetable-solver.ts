@@ -0,0 +1,154 @@
+import { spawn, type ChildProcessWithoutNullStreams } from "child_process"
+import path from "path"
+import readline from "readline"
+
+type PendingRequest = {
+  resolve: (result: any) => void
+  reject: (error: Error) => void
+  timer: ReturnType<typeof setTimeout>
+}
+
+export type SolverJobEvent = {
+  type: "status" | "progress"
+  status?: "queued" | "running" | "completed" | "failed" | "cancelled"
+  phase?: "search" | "optimize" | "done"
+  placed?: number
+  required?: number
+  backtracks?: number
+  best_fitness?: number | null
+  fitness?: number
+  complete?: boolean
+  error?: string | null
+  time: number
+}
+
+/**
+ * Client for the long-running Python solver (scripts/timetable_service.py).
+ * One worker process is shared by all requests of this server instance, so loaded
+ * problems stay cached between requests. Requests and responses are JSON lines
+ * matched by id; background job events arrive as lines with a job_id instead.
+ */
+let worker: ChildProcessWithoutNullStreams | null = null
+let nextRequestId = 1
+const pendingRequests = new Map<number, PendingRequest>()
+const jobListeners = new Map<string, Set<(event: SolverJobEvent) => void>>()
+
+function getWorker() {
+  if (worker) {
+    return worker
+  }
+
+  const child = spawn(process.env.TIMETABLE_SOLVER_PYTHON || "python3", [
+    path.join(process.cwd(), "scripts", "timetable_service.py"),
+  ])
+
+  readline.createInterface({ input: child.stdout }).on("line", (line) => {
+    let response: { id?: number; job_id?: string; event?: SolverJobEvent; result?: any; error?: string }
+    try {
+      response = JSON.parse(line)
+    } catch {
+      console.error("Invalid response from timetable solver:", line)
+      return
+    }
+
+    if (response.job_id && response.event) {
+      jobListeners.get(response.job_id)?.forEach((listener) => listener(response.event!))
+      return
+    }
+
+    const request = pendingRequests.get(response.id!)
+    if (!request) return
+    pendingRequests.delete(response.id!)
+    clearTimeout(request.timer)
+
+    if (response.error) {
+      request.reject(new Error(response.error))
+    } else {
+      request.resolve(response.result)
+    }
+  })
+
+  // Solver progress logs
+  child.stderr.on("data", (chunk) => process.stderr.write(chunk))
+
+  const failPending = (error: Error) => {
+    if (worker === child) worker = null
+    pendingRequests.forEach((request) => {
+      clearTimeout(request.timer)
+      request.reject(error)
+    })
+    pendingRequests.clear()
+  }
+  child.on("error", failPending)
+  child.stdin.on("error", failPending)
+  child.on("exit", (code) => failPending(new Error(`Timetable solver exited with code ${code}`)))
+
+  worker = child
+  return child
+}
+
+/**
+ * Send one request to the solver. Requests are answered in order, so a timed-out request
+ * means the worker is still busy with it (or one before it): the worker is killed rather
+ * than left searching with every later request queued behind it, and the next request
+ * starts a fresh one. Its cached problems are lost with it.
+ */
+export function callSolver<T = any>(method: string, params: Record<string, unknown>, timeoutMs = 120000): Promise<T> {
+  return new Promise((resolve, reject) => {
+    const id = nextRequestId++
+    const child = getWorker()
+    const timer = setTimeout(() => {
+      pendingRequests.delete(id)
+      reject(new Error(`Timetable solver timed out after ${timeoutMs}ms`))
+      if (worker === child) {
+        worker = null
+        child.kill()
+      }
+    }, timeoutMs)
+
+    pendingRequests.set(id, { resolve, reject, timer })
+    child.stdin.write(JSON.stringify({ id, method, params }) + "\n")
+  })
+}
+
+/**
+ * Listen to the events of a background job started with callSolver("submit", ...).
+ * Returns a function that removes the listener.
+ */
+export function subscribeToSolverJob(jobId: string, listener: (event: SolverJobEvent) => void) {
+  const listeners = jobListeners.get(jobId) || new Set()
+  listeners.add(listener)
+  jobListeners.set(jobId, listeners)
+
+  return () => {
+    listeners.delete(listener)
+    if (listeners.size === 0) jobListeners.delete(jobId)
+  }
+}
+
+export type SolverEntryChunk = {
+  option_id: string
+  columns: string[]
+  rows: unknown[][]
+  total: number
+  next_offset: number | null
+}
+
+/**
+ * Page through the entries of a generated option, one chunk of entry objects at a time.
+ * The next chunk is only requested once the caller is done with the previous one,
+ * so a consumer writing each chunk keeps memory flat however large the timetable is.
+ */
+export async function* streamSolverOption(problemKey: string, optionId: string, chunkSize = 500) {
+  let offset: number | null = 0
+  while (offset !== null) {
+    const chunk: SolverEntryChunk = await callSolver<SolverEntryChunk>("export", {
+      problem_key: problemKey,
+      option_id: optionId,
+      offset,
+      limit: chunkSize,
+    })
+    yield chunk.rows.map((row) => Object.fromEntries(chunk.columns.map((column, index) => [column, row[index]])))
+    offset = chunk.next_offset
+  }
+}
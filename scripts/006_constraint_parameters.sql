@@ -0,0 +1,11 @@
+-- Add rule parameters to scheduling constraints
+
+-- Settings of each constraint rule, e.g. {"max_consecutive": 3} or faculty unavailability windows
+ALTER TABLE public.scheduling_constraints
+  ADD COLUMN IF NOT EXISTS parameters JSONB NOT NULL DEFAULT '{}'::jsonb;
+
+-- Constraints evaluated by the generator's rule registry, inactive until configured
+INSERT INTO public.scheduling_constraints (name, type, description, weight, is_active, parameters) VALUES
+('Faculty Unavailability', 'hard', 'Faculty cannot be scheduled in their unavailability windows', 9, false, '{"windows": []}'),
+('Max Consecutive Classes', 'soft', 'Limit back-to-back classes of a batch on a day', 4, false, '{"max_consecutive": 3}'),
+('Lab Contiguous Blocks', 'soft', 'Lab classes of a batch on the same day form one contiguous block', 5, false, '{}');
@@ -0,0 +1,309 @@
+"""
+Timetable Generator Benchmark
+Generates synthetic institutions of several sizes and tightness levels, solves
+them with fixed seeds and writes wall time, peak memory, success rate and
+fitness to a JSON results file that can be compared across commits
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+try:
+    import resource  # Unix only
+except ImportError:
+    resource = None
+
+from timetable_generator import OptimizerConfig, TimetableGenerator
+
+# Institution shapes: departments x batches per department
+SIZES = {
+    "small": {"departments": 1, "batches_per_department": 4},
+    "medium": {"departments": 3, "batches_per_department": 8},
+    "large": {"departments": 6, "batches_per_department": 15},
+}
+
+# Share of room-slots and faculty capacity that the class demand uses
+TIGHTNESS = {
+    "loose": {"room_utilisation": 0.5, "faculty_load": 0.5},
+    "tight": {"room_utilisation": 0.85, "faculty_load": 0.85},
+}
+
+def make_institution(departments: int = 2, batches_per_department: int = 4, subjects_per_department: int = 8,
+                     subjects_per_batch: int = 5, days: int = 5, slots_per_day: int = 7,
+                     room_utilisation: float = 0.6, faculty_load: float = 0.6, lab_share: float = 0.25,
+                     seed: int = 0) -> Dict:
+    """
+    Synthetic institution in the load_data format
+    Classrooms are sized so that the class demand fills room_utilisation of the
+    available room-slots (labs and lecture rooms separately), and each subject gets
+    enough instructors to run its classes at faculty_load of their weekly limit.
+    Every instructor can also teach one more subject of the department.
+    """
+    rng = random.Random(seed)
+    max_classes_per_day, max_classes_per_week = 4, 18
+
+    time_slots = []
+    break_slot = slots_per_day // 2 + 1 if slots_per_day >= 5 else None
+    for day in range(1, days + 1):
+        for number in range(1, slots_per_day + 1):
+            time_slots.append({
+                "id": f"slot_{day}_{number}",
+                "day_of_week": day,
+                "slot_number": number,
+                "start_time": f"{8 + number:02d}:00",
+                "end_time": f"{9 + number:02d}:00",
+                "is_break": number == break_slot,
+                "shift": "morning" if number <= slots_per_day // 2 else "afternoon",
+            })
+    teaching_slots = sum(1 for slot in time_slots if not slot["is_break"])
+
+    subjects, faculty, batches = [], [], []
+    lab_demand = lecture_demand = 0
+    for d in range(departments):
+        department_id = f"dept_{d + 1}"
+        department_subjects = []
+        for s in range(subjects_per_department):
+            department_subjects.append({
+                "id": f"subj_{d + 1}_{s + 1}",
+                "name": f"Subject {d + 1}.{s + 1}",
+                "code": f"D{d + 1}S{s + 1:02d}",
+                "credits": 3,
+                "classes_per_week": rng.choice([2, 3, 4]),
+                "duration_minutes": 60,
+                "requires_lab": rng.random() < lab_share,
+                "subject_type": "core",
+                "department_id": department_id,
+            })
+        subjects.extend(department_subjects)
+
+        demand = {subject["id"]: 0 for subject in department_subjects}
+        for b in range(batches_per_department):
+            # Keep every batch's weekly classes within its teaching slots
+            chosen, classes = [], 0
+            for subject in rng.sample(department_subjects, len(department_subjects)):
+                if len(chosen) < subjects_per_batch and classes + subject["classes_per_week"] <= teaching_slots:
+                    chosen.append(subject)
+                    classes += subject["classes_per_week"]
+            for subject in chosen:
+                demand[subject["id"]] += subject["classes_per_week"]
+                if subject["requires_lab"]:
+                    lab_demand += subject["classes_per_week"]
+                else:
+                    lecture_demand += subject["classes_per_week"]
+            batches.append({
+                "id": f"batch_{d + 1}_{b + 1}",
+                "name": f"D{d + 1}-B{b + 1}",
+                "year": b % 4 + 1,
+                "semester": 1,
+                "student_count": rng.randint(30, 60),
+                "department_id": department_id,
+                "subjects": [subject["id"] for subject in chosen],
+            })
+
+        for s, subject in enumerate(department_subjects):
+            instructors = math.ceil(demand[subject["id"]] / (max_classes_per_week * faculty_load))
+            next_subject = department_subjects[(s + 1) % len(department_subjects)]
+            for i in range(instructors):
+                faculty.append({
+                    "id": f"fac_{d + 1}_{s + 1}_{i + 1}",
+                    "name": f"Instructor {d + 1}.{s + 1}.{i + 1}",
+                    "department_id": department_id,
+                    "max_classes_per_day": max_classes_per_day,
+                    "max_classes_per_week": max_classes_per_week,
+                    "specializations": [],
+                    "subjects": [subject["id"], next_subject["id"]],
+                })
+
+    classrooms = []
+    room_counts = (
+        ("laboratory", math.ceil(lab_demand / (teaching_slots * room_utilisation)), (60, 80)),
+        ("lecture_hall", math.ceil(lecture_demand / (teaching_slots * room_utilisation)), (60, 80, 120)),
+    )
+    for room_type, count, capacities in room_counts:
+        for r in range(count):
+            classrooms.append({
+                "id": f"{room_type}_{r + 1}",
+                "name": f"{room_type.replace('_', ' ').title()} {r + 1}",
+                "capacity": rng.choice(capacities),
+                "type": room_type,
+                "equipment": [],
+                "department_id": f"dept_{r % departments + 1}",
+            })
+
+    constraints = [
+        {"name": name, "type": kind, "weight": weight, "description": name}
+        for name, kind, weight in (
+            ("No Faculty Double Booking", "hard", 10),
+            ("No Classroom Double Booking", "hard", 10),
+            ("No Batch Double Booking", "hard", 10),
+            ("Faculty Workload Limit", "hard", 8),
+            ("Classroom Capacity", "hard", 9),
+            ("Subject-Faculty Matching", "hard", 10),
+            ("Consecutive Classes Preference", "soft", 3),
+            ("Balanced Daily Schedule", "soft", 5),
+        )
+    ]
+
+    return {
+        "time_slots": time_slots,
+        "classrooms": classrooms,
+        "subjects": subjects,
+        "faculty": faculty,
+        "batches": batches,
+        "constraints": constraints,
+    }
+
+def run_case(size: str, tightness: str, seed: int, time_limit: float, optimize: float) -> Dict:
+    """Solve one synthetic institution; runs in a fresh process so peak memory is per run"""
+    sys.stdout = sys.stderr  # keep generator logs out of the report
+    data = make_institution(**SIZES[size], **TIGHTNESS[tightness], seed=seed)
+
+    started = time.perf_counter()
+    generator = TimetableGenerator(seed)
+    generator.load_data(data)
+    load_time = time.perf_counter() - started
+
+    optimizer_config = OptimizerConfig(time_budget=optimize) if optimize > 0 else None
+    started = time.perf_counter()
+    entries, fitness = generator.generate_timetable(optimizer_config=optimizer_config, time_limit=time_limit)
+    wall_time = time.perf_counter() - started
+
+    required = generator.count_required_entries()
+    return {
+        "size": size,
+        "tightness": tightness,
+        "seed": seed,
+        "classes": required,
+        "placed": len(entries),
+        "success": len(entries) == required,
+        "fitness": fitness,
+        "load_time": load_time,
+        "wall_time": wall_time,
+        # ru_maxrss is in KiB on Linux and bytes on macOS
+        "peak_memory_kb": (
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // (1024 if sys.platform == "darwin" else 1)
+            if resource else None
+        ),
+        "nodes_expanded": generator.metrics.nodes_expanded,
+        "backtracks": generator.metrics.backtracks,
+    }
+
+def summarize(runs: List[Dict]) -> List[Dict]:
+    """One summary per (size, tightness) case"""
+    cases: Dict[tuple, List[Dict]] = {}
+    for run in runs:
+        cases.setdefault((run["size"], run["tightness"]), []).append(run)
+
+    summaries = []
+    for (size, tightness), case_runs in cases.items():
+        memory = [run["peak_memory_kb"] for run in case_runs if run["peak_memory_kb"] is not None]
+        summaries.append({
+            "case": f"{size}/{tightness}",
+            "runs": len(case_runs),
+            "classes": statistics.mean(run["classes"] for run in case_runs),
+            "success_rate": sum(run["success"] for run in case_runs) / len(case_runs),
+            "median_wall_time": statistics.median(run["wall_time"] for run in case_runs),
+            "max_wall_time": max(run["wall_time"] for run in case_runs),
+            "mean_fitness": statistics.mean(run["fitness"] for run in case_runs),
+            "max_peak_memory_kb": max(memory) if memory else None,
+        })
+    return summaries
+
+def current_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(sizes: List[str], tightness_levels: List[str], seeds: List[int],
+                  time_limit: float = 60.0, optimize: float = 0.0) -> Dict:
+    """Run every size x tightness x seed case, one fresh process per run"""
+    runs = []
+    context = multiprocessing.get_context("spawn")
+    for size in sizes:
+        for tightness in tightness_levels:
+            for seed in seeds:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    run = pool.submit(run_case, size, tightness, seed, time_limit, optimize).result()
+                runs.append(run)
+                print(
+                    f"[v0] {size}/{tightness} seed {seed}: {run['placed']}/{run['classes']} classes, "
+                    f"fitness {run['fitness']:.4f}, {run['wall_time']:.2f}s"
+                )
+
+    return {
+        "commit": current_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time_limit": time_limit,
+        "optimize": optimize,
+        "cases": summarize(runs),
+        "runs": runs,
+    }
+
+def compare_results(baseline: Dict, results: Dict, threshold: float = 1.2) -> List[str]:
+    """Regressions against a baseline results file: slower by threshold x, less successful, or less fit"""
+    previous = {case["case"]: case for case in baseline.get("cases", [])}
+    regressions = []
+    for case in results["cases"]:
+        old = previous.get(case["case"])
+        if old is None:
+            continue
+        if case["median_wall_time"] > old["median_wall_time"] * threshold:
+            regressions.append(
+                f"{case['case']}: median wall time {old['median_wall_time']:.3f}s -> {case['median_wall_time']:.3f}s"
+            )
+        if case["success_rate"] < old["success_rate"]:
+            regressions.append(f"{case['case']}: success rate {old['success_rate']:.2f} -> {case['success_rate']:.2f}")
+        if case["mean_fitness"] < old["mean_fitness"] - 0.01:
+            regressions.append(f"{case['case']}: mean fitness {old['mean_fitness']:.4f} -> {case['mean_fitness']:.4f}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the timetable generator on synthetic institutions")
+    parser.add_argument("--sizes", nargs="+", default=list(SIZES), choices=list(SIZES))
+    parser.add_argument("--tightness", nargs="+", default=list(TIGHTNESS), choices=list(TIGHTNESS))
+    parser.add_argument("--seeds", nargs="+", type=int, default=[1, 2, 3])
+    parser.add_argument("--time-limit", type=float, default=60.0, help="seconds per run")
+    parser.add_argument("--optimize", type=float, default=0.0, help="local search seconds per run (0 = off)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="earlier results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.2, help="allowed wall time ratio before flagging")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.sizes, args.tightness, args.seeds, args.time_limit, args.optimize)
+    with open(args.output, "w") as results_file:
+        json.dump(results, results_file, indent=2)
+    print(f"[v0] Results written to {args.output}")
+    for case in results["cases"]:
+        print(
+            f"  {case['case']}: success {case['success_rate']:.0%}, median {case['median_wall_time']:.3f}s, "
+            f"fitness {case['mean_fitness']:.4f}, peak {case['max_peak_memory_kb']} KiB"
+        )
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare_results(json.load(baseline_file), results, args.threshold)
+        for regression in regressions:
+            print(f"[v0] Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
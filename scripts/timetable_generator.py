@@ -3,18 +3,34 @@ Smart Timetable Generation Algorithm
 Uses constraint satisfaction and optimization techniques to generate optimal timetables
 """
 
+import contextlib
+import cProfile
+import functools
+import hashlib
+import io
 import json
+import pstats
 import random
-from typing import Dict, List, Tuple, Set, Optional
-from dataclasses import dataclass
+import sys
+import threading
+from typing import Callable, Dict, Iterator, List, Tuple, Set, Optional
+from dataclasses import asdict, dataclass, field, fields, replace
 from enum import Enum
 import itertools
+import math
+import multiprocessing
+import os
+import queue
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 class ConstraintType(Enum):
     HARD = "hard"
     SOFT = "soft"
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class TimeSlot:
     id: str
     day_of_week: int  # 1=Monday, 7=Sunday
@@ -24,7 +40,7 @@ class TimeSlot:
     is_break: bool
     shift: str
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Classroom:
     id: str
     name: str
@@ -33,7 +49,7 @@ class Classroom:
     equipment: List[str]
     department_id: Optional[str]
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Subject:
     id: str
     name: str
@@ -45,7 +61,7 @@ class Subject:
     subject_type: str
     department_id: str
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Faculty:
     id: str
     name: str
@@ -55,7 +71,7 @@ class Faculty:
     specializations: List[str]
     subjects: List[str]  # Subject IDs they can teach
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Batch:
     id: str
     name: str
@@ -65,7 +81,7 @@ class Batch:
     department_id: str
     subjects: List[str]  # Subject IDs for this batch
 
-@dataclass
+@dataclass(slots=True)
 class TimetableEntry:
     time_slot_id: str
     subject_id: str
@@ -74,96 +90,2133 @@ class TimetableEntry:
     batch_id: str
     class_type: str = "lecture"
 
-@dataclass
+# Field order of the value rows entries are exported as
+ENTRY_COLUMNS = tuple(f.name for f in fields(TimetableEntry))
+
+@dataclass(slots=True)
 class Constraint:
     name: str
     type: ConstraintType
     weight: int
     description: str
+    parameters: Dict = field(default_factory=dict)  # rule settings, e.g. {"max_consecutive": 3}
+
+@dataclass(frozen=True)
+class ProblemSnapshot:
+    """Immutable copy of a loaded (and optionally department-filtered) problem"""
+    time_slots: Tuple[TimeSlot, ...]
+    classrooms: Tuple[Classroom, ...]
+    subjects: Tuple[Subject, ...]
+    faculty: Tuple[Faculty, ...]
+    batches: Tuple[Batch, ...]
+    constraints: Tuple[Constraint, ...]
+
+# Catalog tables and their record types; the department-scoped tables are filtered per view,
+# time slots and classrooms are shared by all departments
+CATALOG_TABLES = {
+    "time_slots": TimeSlot, "classrooms": Classroom, "subjects": Subject, "faculty": Faculty, "batches": Batch,
+}
+DEPARTMENT_TABLES = ("subjects", "faculty", "batches")
+
+def intern_id(value):
+    """One string object per id across the catalog instead of one per JSON occurrence"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+class ProblemCatalog:
+    """
+    Problem data shared by immutable, department-scoped views
+    Records are turned into dataclasses only when a view first needs them, and each
+    record only once: all views reference the same time slots, classrooms and
+    constraints, and the whole-catalog view shares its subjects, faculty and batches
+    with the department views. Views are cached, so one catalog can back solves of
+    several departments at the same time.
+    """
+
+    def __init__(self, data: Dict):
+        self.records: Dict[str, List[Dict]] = {name: list(data.get(name, [])) for name in CATALOG_TABLES}
+        self.constraint_records: List[Dict] = list(data.get("constraints", []))
+        self.entities: Dict[str, List] = {name: [None] * len(records) for name, records in self.records.items()}
+        # table -> department_id -> positions of its records, built on the first department view
+        self.department_positions: Dict[str, Dict[str, List[int]]] = {}
+        self.shared_tables: Dict[str, Tuple] = {}
+        self.constraints: Optional[Tuple[Constraint, ...]] = None
+        self.views: Dict[Optional[str], ProblemSnapshot] = {}
+        self.lock = threading.Lock()
+
+    def departments(self) -> List[str]:
+        """Departments that own subjects, faculty or batches"""
+        return sorted({
+            record["department_id"] for name in DEPARTMENT_TABLES for record in self.records[name]
+            if record.get("department_id")
+        })
+
+    def view(self, department_id: Optional[str] = None) -> ProblemSnapshot:
+        """The problem of one department, or of the whole catalog without one"""
+        department_id = department_id or None
+        with self.lock:
+            view = self.views.get(department_id)
+            if view is None:
+                view = ProblemSnapshot(
+                    time_slots=self.shared_table("time_slots"),
+                    classrooms=self.shared_table("classrooms"),
+                    subjects=self.department_table("subjects", department_id),
+                    faculty=self.department_table("faculty", department_id),
+                    batches=self.department_table("batches", department_id),
+                    constraints=self.constraint_table(),
+                )
+                self.views[department_id] = view
+            return view
+
+    def shared_table(self, name: str) -> Tuple:
+        table = self.shared_tables.get(name)
+        if table is None:
+            table = self.shared_tables[name] = self.materialize(name, range(len(self.records[name])))
+        return table
+
+    def department_table(self, name: str, department_id: Optional[str]) -> Tuple:
+        if department_id is None:
+            return self.materialize(name, range(len(self.records[name])))
+        
+        positions = self.department_positions.get(name)
+        if positions is None:
+            positions = self.department_positions[name] = {}
+            for position, record in enumerate(self.records[name]):
+                positions.setdefault(record.get("department_id"), []).append(position)
+        return self.materialize(name, positions.get(department_id, []))
+
+    def materialize(self, name: str, positions) -> Tuple:
+        """Entities of the records at positions, in catalog order, building the missing ones"""
+        record_type = CATALOG_TABLES[name]
+        records, entities = self.records[name], self.entities[name]
+        for position in positions:
+            if entities[position] is None:
+                record = dict(records[position])
+                record["id"] = intern_id(record.get("id"))
+                if "department_id" in record:
+                    record["department_id"] = intern_id(record["department_id"])
+                if "subjects" in record:
+                    record["subjects"] = [intern_id(subject_id) for subject_id in record["subjects"]]
+                entities[position] = record_type(**record)
+        return tuple(entities[position] for position in positions)
+
+    def constraint_table(self) -> Tuple[Constraint, ...]:
+        if self.constraints is None:
+            self.constraints = tuple(
+                Constraint(
+                    name=c['name'],
+                    type=ConstraintType(c['type']),
+                    weight=c['weight'],
+                    description=c['description'],
+                    parameters=c.get('parameters') or {}
+                ) for c in self.constraint_records
+            )
+        return self.constraints
+
+@dataclass
+class SolverMetrics:
+    """Counters and timings of one solve"""
+    nodes_expanded: int = 0  # classes placed by the backtracking search
+    backtracks: int = 0
+    domain_wipeouts: int = 0  # placements rejected because forward checking emptied a domain
+    optimizer_iterations: int = 0
+    cache_hit: bool = False  # timetable taken from the solution cache
+    backend: str = "search"  # search, or the exact solver that built the timetable (cp_sat, milp)
+    # optimal, best_bound (exact solver stopped early), feasible (built-in search), infeasible or unknown
+    solution_status: Optional[str] = None
+    # Exact backends: value and bound of the compiled linear objective, a proxy for fitness;
+    # objective_bound caps that objective, not the fitness score
+    objective: Optional[float] = None
+    objective_bound: Optional[float] = None
+    warm_start_placements: int = 0  # sessions placed where, and as, the warm-start timetable had them
+    elapsed: float = 0.0  # seconds
+    # Only collected when the generator's collect_timings is on
+    timings: Dict[str, float] = field(default_factory=dict)  # method -> seconds, nested calls included
+    calls: Dict[str, int] = field(default_factory=dict)  # method -> number of calls
+    constraint_timings: Dict[str, float] = field(default_factory=dict)  # constraint name -> seconds
+    profile: Optional[str] = None  # cProfile report when the generator's profile is on
+
+    def add_time(self, table: Dict[str, float], name: str, seconds: float):
+        table[name] = table.get(name, 0.0) + seconds
+        if table is self.timings:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+@dataclass
+class PortfolioResult:
+    """Winning timetable of a portfolio solve plus how it was found"""
+    entries: List[TimetableEntry]
+    fitness: float
+    strategy: Optional[str]
+    seed: Optional[int]
+    complete: bool
+    elapsed: float
+    runs: List[Dict]  # strategy, seed, fitness, complete, elapsed (and error, if it raised) of every finished run
+    cancelled_runs: int
+    metrics: Optional[SolverMetrics] = None  # of the winning run
+
+@dataclass
+class ChangeSet:
+    """Changes to apply when repairing an existing timetable"""
+    removed_faculty: List[str] = field(default_factory=list)
+    removed_classrooms: List[str] = field(default_factory=list)
+    removed_time_slots: List[str] = field(default_factory=list)
+    added_subjects: List[Tuple[str, str]] = field(default_factory=list)  # (batch_id, subject_id)
+
+@dataclass
+class RepairResult:
+    """Repaired timetable and how much of the original it kept"""
+    entries: List[TimetableEntry]
+    fitness: float
+    complete: bool
+    kept_entries: int  # original entries left exactly as they were
+    changed_entries: int  # entries added, moved or re-staffed
+    removed_entries: int  # original entries no longer present
+    metrics: Optional[SolverMetrics] = None
+
+@dataclass
+class CampusResult:
+    """Conflict-free timetables of several departments sharing classrooms"""
+    timetables: Dict[str, List[TimetableEntry]]
+    fitness: Dict[str, float]
+    failed_departments: List[str]
+    negotiation_rounds: int
+    metrics: Dict[str, SolverMetrics] = field(default_factory=dict)  # last solve of each department
+
+    @property
+    def complete(self) -> bool:
+        return not self.failed_departments
+
+@dataclass
+class FeasibilityIssue:
+    """A reason no complete timetable exists, in the terms of scheduling_conflicts"""
+    kind: str  # batch_overload, no_qualified_faculty, no_suitable_classroom, faculty_capacity, classroom_capacity
+    conflict_type: str  # faculty_overlap, classroom_overlap or resource_conflict
+    severity: str  # low, medium, high or critical
+    description: str
+    resources: List[str]  # ids of the batches, subjects, faculty and classrooms involved
+    demand: int  # classes per week that need the resources
+    capacity: int  # classes per week the resources can take
+
+@dataclass
+class FeasibilityReport:
+    """Outcome of the pre-solve analysis; feasible only means no bound was violated"""
+    feasible: bool
+    issues: List[FeasibilityIssue]
+    elapsed: float  # seconds
+
+@dataclass
+class OptimizerConfig:
+    """Settings for the post-construction local search"""
+    time_budget: float = 5.0  # seconds
+    max_iterations: int = 1000000
+    initial_temperature: float = 0.01
+    cooling_rate: float = 0.9995
+    min_temperature: float = 0.00001
+    tabu_tenure: int = 10  # iterations a moved entry stays tabu
+    swap_probability: float = 0.5
+
+class SolutionCache:
+    """
+    Persistent cache of complete timetables keyed by a canonical problem hash
+    One JSON file per solution, holding the entries as value rows in ENTRY_COLUMNS
+    order. Reading a solution marks it as recently used; past max_entries the least
+    recently used solutions are deleted.
+    """
+
+    def __init__(self, directory: str, max_entries: int = 64):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Tuple[List[TimetableEntry], float]]:
+        """Cached solution, or None; a malformed file (e.g. of an older schema) is deleted as a miss"""
+        try:
+            with open(self.path(key), encoding="utf-8") as file:
+                solution = json.load(file)
+            entries = [TimetableEntry(**dict(zip(solution["columns"], row))) for row in solution["rows"]]
+            fitness = float(solution["fitness"])
+        except OSError:
+            return None
+        except (ValueError, KeyError, TypeError) as error:
+            print(f"[v0] Discarding unreadable cached solution {key}: {type(error).__name__}: {error}")
+            with contextlib.suppress(OSError):
+                os.remove(self.path(key))
+            return None
+        with contextlib.suppress(OSError):
+            os.utime(self.path(key))
+        return entries, fitness
+
+    def put(self, key: str, entries: List[TimetableEntry], fitness: float):
+        """Store a solution, written to a temporary file first so readers never see half of it"""
+        solution = {
+            "columns": list(ENTRY_COLUMNS),
+            "rows": [[getattr(entry, column) for column in ENTRY_COLUMNS] for entry in entries],
+            "fitness": fitness,
+        }
+        temporary = f"{self.path(key)}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(solution, file, separators=(",", ":"))
+        os.replace(temporary, self.path(key))
+        self.evict()
+
+    def keys(self) -> List[str]:
+        """Cached keys, least recently used first"""
+        names = [name for name in os.listdir(self.directory) if name.endswith(".json")]
+        names.sort(key=lambda name: os.path.getmtime(os.path.join(self.directory, name)))
+        return [name[:-len(".json")] for name in names]
+
+    def evict(self):
+        keys = self.keys()
+        for key in keys[:max(len(keys) - self.max_entries, 0)]:
+            with contextlib.suppress(OSError):
+                os.remove(self.path(key))
+
+def mask_positions(mask: int) -> List[int]:
+    """List the set bit positions of a slot bitmask in ascending order"""
+    positions = []
+    while mask:
+        lowest_bit = mask & -mask
+        positions.append(lowest_bit.bit_length() - 1)
+        mask ^= lowest_bit
+    return positions
+
+def rank_runs(ranks) -> List[int]:
+    """Lengths of the runs of consecutive integers among the given ranks"""
+    runs = []
+    previous = None
+    for rank in sorted(set(ranks)):
+        if previous is not None and rank == previous + 1:
+            runs[-1] += 1
+        else:
+            runs.append(1)
+        previous = rank
+    return runs
+
+def clock_minutes(value: str) -> Optional[int]:
+    """Minutes since midnight of an "HH:MM[:SS]" time, None if it does not parse"""
+    try:
+        hours, minutes = str(value).split(":")[:2]
+        return int(hours) * 60 + int(minutes)
+    except ValueError:
+        return None
+
+def bipartite_max_flow(demands: Dict, capacities: Dict, edges: Dict) -> Tuple[int, Set, Set]:
+    """
+    Maximum flow from left nodes with demands to right nodes with capacities
+    edges maps each left node to the right nodes it may use. When some demand cannot
+    be met, also returns a Hall-violating set: the left nodes still reachable from the
+    source in the residual graph and the right nodes they can use, whose total demand
+    exceeds their total capacity by exactly the shortfall.
+    """
+    left_flow = {node: 0 for node in demands}
+    right_flow = {node: 0 for node in capacities}
+    flows: Dict[Tuple, int] = {}  # (left, right) -> flow
+    right_sources: Dict = {node: set() for node in capacities}  # right -> left nodes sending it flow
+    total = 0
+    
+    while True:
+        # BFS for an augmenting path from any left node with unmet demand
+        left_parents = {node: None for node in demands if left_flow[node] < demands[node]}
+        right_parents = {}
+        frontier = deque(left_parents)
+        end = None
+        while frontier and end is None:
+            node = frontier.popleft()
+            for right in edges.get(node, ()):
+                if right in right_parents or right not in capacities:
+                    continue
+                right_parents[right] = node
+                if right_flow[right] < capacities[right]:
+                    end = right
+                    break
+                for other in right_sources[right]:
+                    if other not in left_parents:
+                        left_parents[other] = right
+                        frontier.append(other)
+        
+        if end is None:
+            return total, set(left_parents), set(right_parents)
+        
+        # Walk the path back: forward edges gain flow, backward edges give it up
+        path = []
+        right = end
+        while True:
+            left = right_parents[right]
+            path.append((left, right))
+            previous = left_parents[left]
+            if previous is None:
+                break
+            right = previous
+        
+        amount = min(capacities[end] - right_flow[end], demands[path[-1][0]] - left_flow[path[-1][0]])
+        for left, right in path[:-1]:
+            amount = min(amount, flows[(left, left_parents[left])])
+        
+        for left, right in path:
+            flows[(left, right)] = flows.get((left, right), 0) + amount
+            right_sources[right].add(left)
+            previous = left_parents[left]
+            if previous is not None:
+                flows[(left, previous)] -= amount
+                if not flows[(left, previous)]:
+                    right_sources[previous].discard(left)
+        right_flow[end] += amount
+        left_flow[path[-1][0]] += amount
+        total += amount
+
+def timed(method: Callable) -> Callable:
+    """Add the run time of a generator method to its metrics when collect_timings is on"""
+    name = method.__name__
+    
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self.collect_timings:
+            return method(self, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.metrics.add_time(self.metrics.timings, name, time.perf_counter() - started)
+    
+    return wrapper
+
+def instrumented_run(method: Callable) -> Callable:
+    """Give each call of a solve method fresh metrics, profiling it when profile is on"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self.metrics = SolverMetrics()
+        profiler = cProfile.Profile() if self.profile else None
+        started = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            if profiler:
+                profiler.disable()
+                report = io.StringIO()
+                pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(30)
+                self.metrics.profile = report.getvalue()
+            self.metrics.elapsed = time.perf_counter() - started
+    
+    return wrapper
+
+class OccupancyIndex:
+    """
+    Incremental occupancy state for the timetable under construction
+    Busy slots are kept as integer bitmasks indexed by slot position.
+    """
+
+    def __init__(self, slot_positions: Dict[str, int], slot_days: Dict[str, int],
+                 day_masks: Dict[int, int], faculty_limits: Dict[str, Tuple[int, int]]):
+        self.slot_positions = slot_positions
+        self.slot_days = slot_days
+        self.day_masks = day_masks
+        self.faculty_limits = faculty_limits  # faculty_id -> (max per day, max per week)
+        # Bitmasks of slot positions that are already taken
+        self.batch_masks: Dict[str, int] = {}
+        self.faculty_masks: Dict[str, int] = {}
+        self.classroom_masks: Dict[str, int] = {}
+        self.group_masks: Dict[Tuple[str, str], int] = {}  # (batch_id, subject_id) -> slots taken
+        # Faculty workload counters
+        self.faculty_day_load: Dict[Tuple[str, int], int] = {}
+        self.faculty_week_load: Dict[str, int] = {}
+        # Busy slots plus days/weeks where the faculty workload limit is reached
+        self.faculty_blocked_masks: Dict[str, int] = {}
+        # Slots faculty members may never take (e.g. unavailability windows)
+        self.faculty_unavailable_masks: Dict[str, int] = {}
+        # (slot position, classroom_id) -> entry holding that room
+        self.classroom_holders: Dict[Tuple[int, str], TimetableEntry] = {}
+
+    def assign(self, entry: TimetableEntry):
+        """Record an entry in the index"""
+        slot_id = entry.time_slot_id
+        bit = 1 << self.slot_positions[slot_id]
+        self.batch_masks[entry.batch_id] = self.batch_masks.get(entry.batch_id, 0) | bit
+        self.faculty_masks[entry.faculty_id] = self.faculty_masks.get(entry.faculty_id, 0) | bit
+        self.classroom_masks[entry.classroom_id] = self.classroom_masks.get(entry.classroom_id, 0) | bit
+        group = (entry.batch_id, entry.subject_id)
+        self.group_masks[group] = self.group_masks.get(group, 0) | bit
+        self.classroom_holders[(self.slot_positions[slot_id], entry.classroom_id)] = entry
+
+        day_key = (entry.faculty_id, self.slot_days.get(slot_id))
+        self.faculty_day_load[day_key] = self.faculty_day_load.get(day_key, 0) + 1
+        self.faculty_week_load[entry.faculty_id] = self.faculty_week_load.get(entry.faculty_id, 0) + 1
+        self.update_faculty_blocked_mask(entry.faculty_id)
+
+    def unassign(self, entry: TimetableEntry):
+        """Remove an entry previously recorded with assign()"""
+        slot_id = entry.time_slot_id
+        bit = 1 << self.slot_positions[slot_id]
+        self.batch_masks[entry.batch_id] &= ~bit
+        self.faculty_masks[entry.faculty_id] &= ~bit
+        self.classroom_masks[entry.classroom_id] &= ~bit
+        self.group_masks[(entry.batch_id, entry.subject_id)] &= ~bit
+        holder_key = (self.slot_positions[slot_id], entry.classroom_id)
+        if self.classroom_holders.get(holder_key) is entry:
+            del self.classroom_holders[holder_key]
+
+        day_key = (entry.faculty_id, self.slot_days.get(slot_id))
+        self.faculty_day_load[day_key] -= 1
+        self.faculty_week_load[entry.faculty_id] -= 1
+        self.update_faculty_blocked_mask(entry.faculty_id)
+
+    def update_faculty_blocked_mask(self, faculty_id: str):
+        """Recompute the slots a faculty member can no longer take"""
+        blocked = self.faculty_mask(faculty_id) | self.faculty_unavailable_masks.get(faculty_id, 0)
+        limits = self.faculty_limits.get(faculty_id)
+        
+        if limits:
+            max_per_day, max_per_week = limits
+            if self.faculty_week_count(faculty_id) >= max_per_week:
+                blocked = -1  # Every slot
+            else:
+                for day, day_mask in self.day_masks.items():
+                    if self.faculty_day_count(faculty_id, day) >= max_per_day:
+                        blocked |= day_mask
+        
+        self.faculty_blocked_masks[faculty_id] = blocked
+
+    def batch_mask(self, batch_id: str) -> int:
+        return self.batch_masks.get(batch_id, 0)
+
+    def faculty_mask(self, faculty_id: str) -> int:
+        return self.faculty_masks.get(faculty_id, 0)
+
+    def classroom_mask(self, classroom_id: str) -> int:
+        return self.classroom_masks.get(classroom_id, 0)
+
+    def faculty_blocked_mask(self, faculty_id: str) -> int:
+        return self.faculty_blocked_masks.get(faculty_id, 0)
+
+    def group_mask(self, batch_id: str, subject_id: str) -> int:
+        return self.group_masks.get((batch_id, subject_id), 0)
+
+    def classroom_holder(self, classroom_id: str, position: int) -> Optional[TimetableEntry]:
+        return self.classroom_holders.get((position, classroom_id))
+
+    def block_classroom(self, classroom_id: str, mask: int):
+        """Mark slots of a classroom as unavailable without an entry holding them"""
+        self.classroom_masks[classroom_id] = self.classroom_mask(classroom_id) | mask
+
+    def block_faculty(self, faculty_id: str, mask: int):
+        """Mark slots a faculty member may never take"""
+        self.faculty_unavailable_masks[faculty_id] = self.faculty_unavailable_masks.get(faculty_id, 0) | mask
+        self.update_faculty_blocked_mask(faculty_id)
+
+    def is_batch_busy(self, batch_id: str, slot_id: str) -> bool:
+        return bool(self.batch_mask(batch_id) >> self.slot_positions[slot_id] & 1)
+
+    def is_faculty_busy(self, faculty_id: str, slot_id: str) -> bool:
+        return bool(self.faculty_mask(faculty_id) >> self.slot_positions[slot_id] & 1)
+
+    def is_classroom_busy(self, classroom_id: str, slot_id: str) -> bool:
+        return bool(self.classroom_mask(classroom_id) >> self.slot_positions[slot_id] & 1)
+
+    def faculty_day_count(self, faculty_id: str, day_of_week: int) -> int:
+        return self.faculty_day_load.get((faculty_id, day_of_week), 0)
+
+    def faculty_week_count(self, faculty_id: str) -> int:
+        return self.faculty_week_load.get(faculty_id, 0)
+
+    def faculty_slack(self, faculty_id: str, day_of_week: int) -> Tuple[int, int]:
+        """Classes a faculty member can still take in the week and on a day; larger is less loaded"""
+        max_per_day, max_per_week = self.faculty_limits.get(faculty_id, (0, 0))
+        return (
+            max_per_week - self.faculty_week_count(faculty_id),
+            max_per_day - self.faculty_day_count(faculty_id, day_of_week),
+        )
+
+@dataclass
+class EncodedTimetable:
+    """Struct-of-arrays view of a timetable: one integer column per entry field"""
+    slot_idx: array
+    batch_idx: array
+    faculty_idx: array
+    room_idx: array
+    subject_idx: array
+    type_idx: array  # class type
+
+    def __len__(self) -> int:
+        return len(self.slot_idx)
+
+class TimetableScorer:
+    """
+    Scores timetables encoded as integer arrays against the loaded catalog
+    Catalog lookups are precomputed once; every constraint is a single pass
+    of counting over the entry columns.
+    """
+
+    WEEKDAYS = range(1, 6)  # Monday to Friday
+
+    # Class types of timetable_entries.class_type; fixed codes, so encoded timetables travel between processes
+    CLASS_TYPES = ("lecture", "practical", "tutorial", "seminar")
+
+    # Constraint name -> scoring method
+    CONSTRAINT_METHODS = {
+        "No Faculty Double Booking": "no_faculty_double_booking",
+        "No Classroom Double Booking": "no_classroom_double_booking",
+        "No Batch Double Booking": "no_batch_double_booking",
+        "Faculty Workload Limit": "faculty_workload_limits",
+        "Classroom Capacity": "classroom_capacity",
+        "Subject-Faculty Matching": "subject_faculty_matching",
+        "Consecutive Classes Preference": "consecutive_classes",
+        "Balanced Daily Schedule": "balanced_schedule",
+    }
+
+    def __init__(self, time_slots: List[TimeSlot], classrooms: List[Classroom], subjects: List[Subject],
+                 faculty: List[Faculty], batches: List[Batch]):
+        # id -> index maps; the first occurrence of an id wins, as with next(...) lookups
+        self.slot_codes = self._first_index([ts.id for ts in time_slots])
+        self.batch_codes = self._first_index([b.id for b in batches])
+        self.faculty_codes = self._first_index([f.id for f in faculty])
+        self.room_codes = self._first_index([c.id for c in classrooms])
+        self.subject_codes = self._first_index([s.id for s in subjects])
+        self.type_codes = self._first_index(list(self.CLASS_TYPES))
+        
+        self.slot_days = [ts.day_of_week for ts in time_slots]
+        self.slot_numbers = [ts.slot_number for ts in time_slots]
+        self.slot_is_break = [ts.is_break for ts in time_slots]
+        self.slot_times = [(clock_minutes(ts.start_time), clock_minutes(ts.end_time)) for ts in time_slots]
+        # Slots of each day by slot number, and each slot's rank there: adjacent ranks are back-to-back slots
+        self.day_slots: Dict[int, List[int]] = {}
+        for code in sorted(range(len(time_slots)), key=lambda code: time_slots[code].slot_number):
+            self.day_slots.setdefault(time_slots[code].day_of_week, []).append(code)
+        self.slot_ranks = [0] * len(time_slots)
+        for codes in self.day_slots.values():
+            for rank, code in enumerate(codes):
+                self.slot_ranks[code] = rank
+        self.batch_sizes = [b.student_count for b in batches]
+        self.room_capacities = [c.capacity for c in classrooms]
+        self.subject_labs = [s.requires_lab for s in subjects]
+        self.faculty_limits = [(f.max_classes_per_day, f.max_classes_per_week) for f in faculty]
+        self.faculty_subjects: List[Set[int]] = []
+        
+        # Batch rows per catalog position (duplicated batch ids each keep their own row)
+        self.batch_rows = [self.batch_codes[b.id] for b in batches]
+        self.faculty_rows = [self.faculty_codes[f.id] for f in faculty]
+        
+        for faculty_member in faculty:
+            self.faculty_subjects.append({self.intern(self.subject_codes, s) for s in faculty_member.subjects})
+
+    @classmethod
+    def for_snapshot(cls, snapshot: ProblemSnapshot) -> "TimetableScorer":
+        return cls(snapshot.time_slots, snapshot.classrooms, snapshot.subjects, snapshot.faculty, snapshot.batches)
+
+    @staticmethod
+    def _first_index(ids: List[str]) -> Dict[str, int]:
+        codes: Dict[str, int] = {}
+        for index, item_id in enumerate(ids):
+            codes.setdefault(item_id, index)
+        return codes
+
+    @staticmethod
+    def intern(codes: Dict[str, int], item_id: str) -> int:
+        """Code for an id; ids missing from the catalog get fresh codes past the catalog range"""
+        code = codes.get(item_id)
+        if code is None:
+            code = codes[item_id] = -1 - len(codes)
+        return code
+
+    def encode(self, entries: List[TimetableEntry]) -> EncodedTimetable:
+        """Encode timetable entries as integer columns (negative codes = not in catalog)"""
+        return EncodedTimetable(
+            slot_idx=array('l', [self.intern(self.slot_codes, e.time_slot_id) for e in entries]),
+            batch_idx=array('l', [self.intern(self.batch_codes, e.batch_id) for e in entries]),
+            faculty_idx=array('l', [self.intern(self.faculty_codes, e.faculty_id) for e in entries]),
+            room_idx=array('l', [self.intern(self.room_codes, e.classroom_id) for e in entries]),
+            subject_idx=array('l', [self.intern(self.subject_codes, e.subject_id) for e in entries]),
+            type_idx=array('l', [self.intern(self.type_codes, e.class_type) for e in entries]),
+        )
+
+    def iter_entry_rows(self, encoded: EncodedTimetable, chunk_size: int = 500,
+                        start: int = 0) -> Iterator[List[list]]:
+        """
+        Yield the entries of an encoded timetable from index start on as chunks of
+        value rows in ENTRY_COLUMNS order
+        Only one chunk is decoded at a time, so exporting stays flat in memory.
+        """
+        slots, batches = self.ids_by_code(self.slot_codes), self.ids_by_code(self.batch_codes)
+        faculty, rooms = self.ids_by_code(self.faculty_codes), self.ids_by_code(self.room_codes)
+        subjects, types = self.ids_by_code(self.subject_codes), self.ids_by_code(self.type_codes)
+        
+        for offset in range(start, len(encoded), chunk_size):
+            stop = offset + chunk_size
+            yield [
+                [slots[slot], subjects[subject], faculty[faculty_member], rooms[room], batches[batch], types[class_type]]
+                for slot, batch, faculty_member, room, subject, class_type in zip(
+                    encoded.slot_idx[offset:stop], encoded.batch_idx[offset:stop], encoded.faculty_idx[offset:stop],
+                    encoded.room_idx[offset:stop], encoded.subject_idx[offset:stop], encoded.type_idx[offset:stop],
+                )
+            ]
+
+    @staticmethod
+    def ids_by_code(codes: Dict[str, int]) -> Dict[int, str]:
+        return {code: item_id for item_id, code in codes.items()}
+
+    def decode(self, encoded: EncodedTimetable) -> List[TimetableEntry]:
+        """
+        Materialize the entries of an encoded timetable
+        Catalog codes decode with any scorer built from the same catalog; codes of ids
+        outside the catalog only with the scorer that encoded them.
+        """
+        slots, batches = self.ids_by_code(self.slot_codes), self.ids_by_code(self.batch_codes)
+        faculty, rooms = self.ids_by_code(self.faculty_codes), self.ids_by_code(self.room_codes)
+        subjects, types = self.ids_by_code(self.subject_codes), self.ids_by_code(self.type_codes)
+        return [
+            TimetableEntry(
+                time_slot_id=slots[slot],
+                subject_id=subjects[subject],
+                faculty_id=faculty[faculty_member],
+                classroom_id=rooms[room],
+                batch_id=batches[batch],
+                class_type=types[class_type],
+            )
+            for slot, batch, faculty_member, room, subject, class_type in zip(
+                encoded.slot_idx, encoded.batch_idx, encoded.faculty_idx,
+                encoded.room_idx, encoded.subject_idx, encoded.type_idx
+            )
+        ]
+
+    def _double_booking(self, slot_idx: array, resource_idx: array) -> float:
+        violations = 0
+        total_checks = 0
+        seen = set()
+        
+        for slot, resource in zip(slot_idx, resource_idx):
+            if slot < 0 or self.slot_is_break[slot]:
+                continue
+            
+            total_checks += 1
+            if (slot, resource) in seen:
+                violations += 1
+            else:
+                seen.add((slot, resource))
+        
+        return 1.0 - (violations / max(total_checks, 1))
+
+    def no_faculty_double_booking(self, encoded: EncodedTimetable) -> float:
+        return self._double_booking(encoded.slot_idx, encoded.faculty_idx)
+
+    def no_classroom_double_booking(self, encoded: EncodedTimetable) -> float:
+        return self._double_booking(encoded.slot_idx, encoded.room_idx)
+
+    def no_batch_double_booking(self, encoded: EncodedTimetable) -> float:
+        return self._double_booking(encoded.slot_idx, encoded.batch_idx)
+
+    def faculty_workload_limits(self, encoded: EncodedTimetable) -> float:
+        daily_counts: Dict[Tuple[int, int], int] = {}
+        weekly_counts: Dict[int, int] = {}
+        
+        for slot, faculty in zip(encoded.slot_idx, encoded.faculty_idx):
+            weekly_counts[faculty] = weekly_counts.get(faculty, 0) + 1
+            if slot >= 0:
+                key = (faculty, self.slot_days[slot])
+                daily_counts[key] = daily_counts.get(key, 0) + 1
+        
+        violations = 0
+        for row, (max_per_day, max_per_week) in zip(self.faculty_rows, self.faculty_limits):
+            for day in self.WEEKDAYS:
+                if daily_counts.get((row, day), 0) > max_per_day:
+                    violations += 1
+            
+            if weekly_counts.get(row, 0) > max_per_week:
+                violations += 1
+        
+        return 1.0 - (violations / max(len(self.faculty_limits) * 6, 1))  # 5 days + 1 weekly check
+
+    def classroom_capacity(self, encoded: EncodedTimetable) -> float:
+        violations = sum(
+            1 for batch, room in zip(encoded.batch_idx, encoded.room_idx)
+            if batch >= 0 and room >= 0 and self.batch_sizes[batch] > self.room_capacities[room]
+        )
+        return 1.0 - (violations / max(len(encoded), 1))
+
+    def subject_faculty_matching(self, encoded: EncodedTimetable) -> float:
+        violations = sum(
+            1 for faculty, subject in zip(encoded.faculty_idx, encoded.subject_idx)
+            if faculty >= 0 and subject not in self.faculty_subjects[faculty]
+        )
+        return 1.0 - (violations / max(len(encoded), 1))
+
+    def consecutive_classes(self, encoded: EncodedTimetable) -> float:
+        # Group (slot_number, entry order, subject) by batch and day
+        day_entries: Dict[Tuple[int, int], List[Tuple[int, int, int]]] = {}
+        for order, (slot, batch, subject) in enumerate(zip(encoded.slot_idx, encoded.batch_idx, encoded.subject_idx)):
+            if slot >= 0 and batch >= 0:
+                key = (batch, self.slot_days[slot])
+                day_entries.setdefault(key, []).append((self.slot_numbers[slot], order, subject))
+        
+        consecutive_bonus = 0
+        total_possible = 0
+        for row in self.batch_rows:
+            for day in self.WEEKDAYS:
+                entries = sorted(day_entries.get((row, day), []))
+                total_possible += max(len(entries) - 1, 0)
+                consecutive_bonus += sum(
+                    1 for current, following in zip(entries, entries[1:]) if current[2] == following[2]
+                )
+        
+        return consecutive_bonus / max(total_possible, 1)
+
+    def balanced_schedule(self, encoded: EncodedTimetable) -> float:
+        daily_counts: Dict[int, List[int]] = {}
+        for slot, batch in zip(encoded.slot_idx, encoded.batch_idx):
+            if slot >= 0 and batch >= 0 and 1 <= self.slot_days[slot] <= 5:
+                counts = daily_counts.setdefault(batch, [0] * 5)
+                counts[self.slot_days[slot] - 1] += 1
+        
+        balance_score = 0
+        for row in self.batch_rows:
+            counts = daily_counts.get(row)
+            
+            # Calculate variance (lower is better)
+            if counts and sum(counts) > 0:
+                mean_classes = sum(counts) / 5
+                variance = sum((count - mean_classes) ** 2 for count in counts) / 5
+                # Convert to score (0-1, higher is better)
+                balance_score += 1.0 / (1.0 + variance)
+        
+        return balance_score / max(len(self.batch_rows), 1)
+
+class FitnessState:
+    """
+    Constraint aggregates of one encoded timetable, kept up to date under moves
+    Moving or swapping entries only touches the counters of the affected
+    slots, faculty members and batch-days, so each change is O(affected entries).
+    """
+
+    BOOKING_KINDS = ("faculty", "room", "batch")
+
+    def __init__(self, scorer: TimetableScorer, encoded: EncodedTimetable, rules: List["ConstraintRule"]):
+        self.scorer = scorer
+        self.slot_idx = array('l', encoded.slot_idx)
+        self.batch_idx = array('l', encoded.batch_idx)
+        self.faculty_idx = array('l', encoded.faculty_idx)
+        self.room_idx = array('l', encoded.room_idx)
+        self.subject_idx = array('l', encoded.subject_idx)
+        self.type_idx = array('l', encoded.type_idx)
+        
+        # Catalog rows per code (duplicated ids are scored once per row, as in TimetableScorer)
+        self.faculty_rows: Dict[int, List[Tuple[int, int]]] = {}
+        for row, limits in zip(scorer.faculty_rows, scorer.faculty_limits):
+            self.faculty_rows.setdefault(row, []).append(limits)
+        self.batch_multiplicity: Dict[int, int] = {}
+        for row in scorer.batch_rows:
+            self.batch_multiplicity[row] = self.batch_multiplicity.get(row, 0) + 1
+        
+        # Double booking: entries per (slot, resource) in non-break slots
+        self.booking_counts: Dict[str, Dict[Tuple[int, int], int]] = {kind: {} for kind in self.BOOKING_KINDS}
+        self.booking_violations: Dict[str, int] = {kind: 0 for kind in self.BOOKING_KINDS}
+        self.booked_entries = 0
+        
+        # Faculty workload
+        self.faculty_day_counts: Dict[Tuple[int, int], int] = {}
+        self.faculty_week_counts: Dict[int, int] = {}
+        self.workload_violations = 0
+        
+        self.capacity_violations = 0
+        self.matching_violations = 0
+        
+        # Consecutive classes: entry indices per (batch, day) and their (bonus, pairs) contribution
+        self.day_groups: Dict[Tuple[int, int], Set[int]] = {}
+        self.group_pairs: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        self.consecutive_bonus = 0
+        self.consecutive_pairs = 0
+        
+        # Balanced schedule: weekday counts per batch and their score term
+        self.batch_daily_counts: Dict[int, List[int]] = {}
+        self.batch_terms: Dict[int, float] = {}
+        self.balance_total = 0.0
+        
+        # Constraint name -> incremental evaluator; only some need to see every entry change
+        self.trackers: Dict[str, RuleTracker] = {rule.constraint.name: rule.tracker(self) for rule in rules}
+        self.entry_trackers = [tracker for tracker in self.trackers.values() if tracker.tracks_entries]
+        
+        for index in range(len(self.slot_idx)):
+            self._update(index, 1)
+
+    def __len__(self) -> int:
+        return len(self.slot_idx)
+
+    def encoded(self) -> EncodedTimetable:
+        """The current columns as an encoded timetable (shared, not copied)"""
+        return EncodedTimetable(
+            self.slot_idx, self.batch_idx, self.faculty_idx, self.room_idx, self.subject_idx, self.type_idx
+        )
+
+    def _update(self, index: int, sign: int):
+        """Add (sign=1) or remove (sign=-1) the contributions of one entry"""
+        for tracker in self.entry_trackers:
+            tracker.update(index, sign)
+        
+        scorer = self.scorer
+        slot = self.slot_idx[index]
+        batch = self.batch_idx[index]
+        faculty = self.faculty_idx[index]
+        room = self.room_idx[index]
+        subject = self.subject_idx[index]
+        day = scorer.slot_days[slot] if slot >= 0 else None
+        
+        if slot >= 0 and not scorer.slot_is_break[slot]:
+            self.booked_entries += sign
+            for kind, code in zip(self.BOOKING_KINDS, (faculty, room, batch)):
+                counts = self.booking_counts[kind]
+                old = counts.get((slot, code), 0)
+                counts[(slot, code)] = old + sign
+                self.booking_violations[kind] += max(old + sign - 1, 0) - max(old - 1, 0)
+        
+        rows = self.faculty_rows.get(faculty, [])
+        old_week = self.faculty_week_counts.get(faculty, 0)
+        self.faculty_week_counts[faculty] = old_week + sign
+        for max_per_day, max_per_week in rows:
+            self.workload_violations += (old_week + sign > max_per_week) - (old_week > max_per_week)
+        if day is not None:
+            old_day = self.faculty_day_counts.get((faculty, day), 0)
+            self.faculty_day_counts[(faculty, day)] = old_day + sign
+            if day in TimetableScorer.WEEKDAYS:
+                for max_per_day, max_per_week in rows:
+                    self.workload_violations += (old_day + sign > max_per_day) - (old_day > max_per_day)
+        
+        if batch >= 0 and room >= 0 and scorer.batch_sizes[batch] > scorer.room_capacities[room]:
+            self.capacity_violations += sign
+        if faculty >= 0 and subject not in scorer.faculty_subjects[faculty]:
+            self.matching_violations += sign
+        
+        if day is None or batch < 0:
+            return
+        
+        group = self.day_groups.setdefault((batch, day), set())
+        if sign > 0:
+            group.add(index)
+        else:
+            group.discard(index)
+        self._refresh_group((batch, day))
+        
+        if day in TimetableScorer.WEEKDAYS:
+            counts = self.batch_daily_counts.setdefault(batch, [0] * 5)
+            counts[day - 1] += sign
+            self._refresh_batch_term(batch)
+
+    def _refresh_group(self, key: Tuple[int, int]):
+        """Recompute the consecutive-class contribution of one (batch, day) group"""
+        multiplicity = self.batch_multiplicity.get(key[0], 0)
+        bonus = pairs = 0
+        
+        if multiplicity and key[1] in TimetableScorer.WEEKDAYS:
+            entries = sorted(
+                (self.scorer.slot_numbers[self.slot_idx[i]], i, self.subject_idx[i]) for i in self.day_groups[key]
+            )
+            pairs = max(len(entries) - 1, 0) * multiplicity
+            bonus = sum(
+                1 for current, following in zip(entries, entries[1:]) if current[2] == following[2]
+            ) * multiplicity
+        
+        old_bonus, old_pairs = self.group_pairs.get(key, (0, 0))
+        self.group_pairs[key] = (bonus, pairs)
+        self.consecutive_bonus += bonus - old_bonus
+        self.consecutive_pairs += pairs - old_pairs
+
+    def _refresh_batch_term(self, batch: int):
+        """Recompute the balanced-schedule term of one batch"""
+        counts = self.batch_daily_counts[batch]
+        term = 0.0
+        
+        if sum(counts) > 0:
+            mean_classes = sum(counts) / 5
+            variance = sum((count - mean_classes) ** 2 for count in counts) / 5
+            term = self.batch_multiplicity.get(batch, 0) / (1.0 + variance)
+        
+        self.balance_total += term - self.batch_terms.get(batch, 0.0)
+        self.batch_terms[batch] = term
+
+    def move(self, index: int, slot: int, faculty: int, room: int) -> Tuple[int, int, int]:
+        """Move an entry to new slot/faculty/room codes; returns the previous codes"""
+        previous = (self.slot_idx[index], self.faculty_idx[index], self.room_idx[index])
+        self._update(index, -1)
+        self.slot_idx[index] = slot
+        self.faculty_idx[index] = faculty
+        self.room_idx[index] = room
+        self._update(index, 1)
+        return previous
+
+    def swap_slots(self, first: int, second: int):
+        """Exchange the time slots of two entries"""
+        self._update(first, -1)
+        self._update(second, -1)
+        self.slot_idx[first], self.slot_idx[second] = self.slot_idx[second], self.slot_idx[first]
+        self._update(first, 1)
+        self._update(second, 1)
+
+    def _booking_score(self, kind: str) -> float:
+        return 1.0 - (self.booking_violations[kind] / max(self.booked_entries, 1))
+
+    def no_faculty_double_booking(self) -> float:
+        return self._booking_score("faculty")
+
+    def no_classroom_double_booking(self) -> float:
+        return self._booking_score("room")
+
+    def no_batch_double_booking(self) -> float:
+        return self._booking_score("batch")
+
+    def faculty_workload_limits(self) -> float:
+        return 1.0 - (self.workload_violations / max(len(self.scorer.faculty_limits) * 6, 1))
+
+    def classroom_capacity(self) -> float:
+        return 1.0 - (self.capacity_violations / max(len(self), 1))
+
+    def subject_faculty_matching(self) -> float:
+        return 1.0 - (self.matching_violations / max(len(self), 1))
+
+    def consecutive_classes(self) -> float:
+        return self.consecutive_bonus / max(self.consecutive_pairs, 1)
+
+    def balanced_schedule(self) -> float:
+        return self.balance_total / max(len(self.scorer.batch_rows), 1)
+
+    def constraint_score(self, constraint: Constraint) -> float:
+        """Current score of a constraint (returns 0-1)"""
+        tracker = self.trackers.get(constraint.name)
+        return tracker.score() if tracker else 1.0  # Not compiled for this state, assume satisfied
+
+    def fitness(self, constraints: List[Constraint]) -> float:
+        """Normalized weighted fitness (0-1), as calculate_fitness"""
+        total_score = sum(self.constraint_score(c) * c.weight for c in constraints)
+        max_possible_score = sum(c.weight for c in constraints)
+        return total_score / max_possible_score if max_possible_score > 0 else 0.0
+
+# Constraint name -> rule factory, called as factory(scorer, constraint)
+CONSTRAINT_RULES: Dict[str, Callable[[TimetableScorer, Constraint], "ConstraintRule"]] = {}
+
+def register_constraint(*names: str) -> Callable:
+    """Class decorator registering a ConstraintRule for scheduling_constraints rows with these names"""
+    def register(rule_class):
+        for name in names:
+            CONSTRAINT_RULES[name] = rule_class
+        return rule_class
+    return register
+
+def compile_constraint(scorer: TimetableScorer, constraint: Constraint) -> "ConstraintRule":
+    """Compile a constraint against a catalog; unregistered names compile to a neutral rule"""
+    factory = CONSTRAINT_RULES.get(constraint.name, NeutralRule)
+    return factory(scorer, constraint)
+
+class ConstraintRule:
+    """
+    A scheduling constraint compiled against one catalog
+    score() evaluates a whole encoded timetable and tracker() creates the incremental
+    evaluator FitnessState keeps up to date under moves. Hard rules can also prune the
+    search: faculty_unavailability() gives slots faculty members may never take,
+    blocked_slots() the slots where one more class of a batch-subject group would break
+    the rule, and blocks_session() whether a multi-slot session would. add_model_terms()
+    adds the rule to an exact solver model. Parameters are turned into lookup tables
+    once, in __init__.
+    Slot codes double as slot positions of the generator's bitmasks.
+    """
+
+    prunes_search = False  # True when blocked_slots() can rule out slots
+
+    def __init__(self, scorer: TimetableScorer, constraint: Constraint):
+        self.scorer = scorer
+        self.constraint = constraint
+
+    @property
+    def is_hard(self) -> bool:
+        return self.constraint.type == ConstraintType.HARD
+
+    def score(self, encoded: EncodedTimetable) -> float:
+        """Score of a whole timetable (returns 0-1)"""
+        raise NotImplementedError
+
+    def tracker(self, state: FitnessState) -> "RuleTracker":
+        """Incremental evaluator over a fitness state; by default it rescores the whole timetable"""
+        return RuleTracker(self, state)
+
+    def faculty_unavailability(self) -> Dict[str, int]:
+        """faculty_id -> bitmask of slots the faculty member may never take"""
+        return {}
+
+    def blocked_slots(self, occupancy: OccupancyIndex, batch_id: str, subject_id: str) -> int:
+        """Bitmask of slots where one more class of the group would break the rule"""
+        return 0
+
+    def blocks_session(self, occupancy: OccupancyIndex, batch_id: str, subject_id: str, cover: int) -> bool:
+        """Whether a session of the group taking every slot of cover (a bitmask) would break the rule"""
+        return bool(self.blocked_slots(occupancy, batch_id, subject_id) & cover)
+
+    def add_model_terms(self, model) -> bool:
+        """
+        Add the rule to a timetable_exact.TimetableModel; False when the model leaves it
+        out, in which case it is only scored (and, if hard, checked) afterwards
+        """
+        return False
+
+class RuleTracker:
+    """Incremental evaluator of one rule over a FitnessState"""
+
+    tracks_entries = False  # True when update() must see every entry change
+
+    def __init__(self, rule: ConstraintRule, state: FitnessState):
+        self.rule = rule
+        self.state = state
+
+    def update(self, index: int, sign: int):
+        """Add (sign=1) or remove (sign=-1) the state's entry at index"""
+
+    def score(self) -> float:
+        return self.rule.score(self.state.encoded())
+
+class NeutralRule(ConstraintRule):
+    """Constraint without a registered evaluator; always satisfied"""
+
+    def score(self, encoded: EncodedTimetable) -> float:
+        return 1.0
+
+    def add_model_terms(self, model) -> bool:
+        model.model.objective_offset += model.share(self.constraint)
+        return True
+
+class BuiltinRule(ConstraintRule):
+    """Constraint scored by a TimetableScorer method and tracked by FitnessState's own aggregates"""
+
+    def __init__(self, scorer: TimetableScorer, constraint: Constraint, method: str):
+        super().__init__(scorer, constraint)
+        self.method = method
+
+    def score(self, encoded: EncodedTimetable) -> float:
+        return getattr(self.scorer, self.method)(encoded)
+
+    def tracker(self, state: FitnessState) -> RuleTracker:
+        return BuiltinTracker(self, state)
+
+    def add_model_terms(self, model) -> bool:
+        return model.add_builtin_terms(self.method, self.constraint)
+
+class BuiltinTracker(RuleTracker):
+    def score(self) -> float:
+        return getattr(self.state, self.rule.method)()
+
+CONSTRAINT_RULES.update(
+    (name, functools.partial(BuiltinRule, method=method)) for name, method in TimetableScorer.CONSTRAINT_METHODS.items()
+)
+
+class GroupedRule(ConstraintRule):
+    """
+    Rule whose penalty is a sum over groups of entries, e.g. the classes of one batch on one day
+    Subclasses define group_key() of an entry row (slot, batch, faculty, room, subject, index)
+    and group_penalty() of a group's rows, returning (penalty, units). The score is
+    1 - total penalty / total units, and an entry change only re-evaluates its groups.
+    """
+
+    def group_key(self, row: Tuple[int, ...]) -> Optional[tuple]:
+        raise NotImplementedError
+
+    def group_penalty(self, rows: List[Tuple[int, ...]]) -> Tuple[int, int]:
+        raise NotImplementedError
+
+    def score(self, encoded: EncodedTimetable) -> float:
+        groups: Dict[tuple, List[Tuple[int, ...]]] = {}
+        for row in zip(encoded.slot_idx, encoded.batch_idx, encoded.faculty_idx,
+                       encoded.room_idx, encoded.subject_idx, range(len(encoded))):
+            key = self.group_key(row)
+            if key is not None:
+                groups.setdefault(key, []).append(row)
+        
+        penalty = units = 0
+        for rows in groups.values():
+            group_penalty, group_units = self.group_penalty(rows)
+            penalty += group_penalty
+            units += group_units
+        return 1.0 - (penalty / max(units, 1))
+
+    def tracker(self, state: FitnessState) -> RuleTracker:
+        return GroupedTracker(self, state)
+
+class GroupedTracker(RuleTracker):
+    tracks_entries = True
+
+    def __init__(self, rule: GroupedRule, state: FitnessState):
+        super().__init__(rule, state)
+        self.groups: Dict[tuple, Dict[int, Tuple[int, ...]]] = {}
+        self.group_totals: Dict[tuple, Tuple[int, int]] = {}
+        self.penalty = 0
+        self.units = 0
+
+    def update(self, index: int, sign: int):
+        state = self.state
+        row = (state.slot_idx[index], state.batch_idx[index], state.faculty_idx[index],
+               state.room_idx[index], state.subject_idx[index], index)
+        key = self.rule.group_key(row)
+        if key is None:
+            return
+        
+        rows = self.groups.setdefault(key, {})
+        if sign > 0:
+            rows[index] = row
+        else:
+            rows.pop(index, None)
+        
+        penalty, units = self.rule.group_penalty(list(rows.values())) if rows else (0, 0)
+        old_penalty, old_units = self.group_totals.get(key, (0, 0))
+        self.group_totals[key] = (penalty, units)
+        self.penalty += penalty - old_penalty
+        self.units += units - old_units
+
+    def score(self) -> float:
+        return 1.0 - (self.penalty / max(self.units, 1))
+
+@register_constraint("Faculty Unavailability", "Faculty Preference Hours")
+class FacultyWindowsRule(ConstraintRule):
+    """
+    Faculty members should not teach in given time windows
+    parameters: {"windows": [{"faculty_id", "day_of_week", "start_time", "end_time"}
+    or {"faculty_id", "time_slot_ids"}]}; a window without day_of_week covers every day.
+    A window without times covers the whole day. As a hard rule the windows are
+    blocked for the search.
+    """
+
+    def __init__(self, scorer: TimetableScorer, constraint: Constraint):
+        super().__init__(scorer, constraint)
+        self.unavailable: Dict[str, int] = {}
+        for window in constraint.parameters.get("windows", []):
+            mask = 0
+            slot_ids = set(window.get("time_slot_ids", []))
+            start, end = clock_minutes(window.get("start_time")), clock_minutes(window.get("end_time"))
+            for slot_id, code in scorer.slot_codes.items():
+                if code < 0:
+                    continue
+                if slot_ids:
+                    in_window = slot_id in slot_ids
+                else:
+                    slot_start, slot_end = scorer.slot_times[code]
+                    in_window = window.get("day_of_week") in (None, scorer.slot_days[code]) and (
+                        start is None or end is None
+                        or (slot_start is not None and slot_end is not None and slot_start < end and slot_end > start)
+                    )
+                if in_window:
+                    mask |= 1 << code
+            faculty_id = window["faculty_id"]
+            self.unavailable[faculty_id] = self.unavailable.get(faculty_id, 0) | mask
+        
+        # Faculty code -> blocked slot bitmask
+        self.faculty_masks = {
+            scorer.faculty_codes[faculty_id]: mask
+            for faculty_id, mask in self.unavailable.items() if faculty_id in scorer.faculty_codes
+        }
+
+    def violates(self, slot: int, faculty: int) -> bool:
+        return slot >= 0 and bool(self.faculty_masks.get(faculty, 0) >> slot & 1)
+
+    def score(self, encoded: EncodedTimetable) -> float:
+        violations = sum(1 for slot, faculty in zip(encoded.slot_idx, encoded.faculty_idx) if self.violates(slot, faculty))
+        return 1.0 - (violations / max(len(encoded), 1))
+
+    def tracker(self, state: FitnessState) -> RuleTracker:
+        return FacultyWindowsTracker(self, state)
+
+    def faculty_unavailability(self) -> Dict[str, int]:
+        return self.unavailable
+
+    def add_model_terms(self, model) -> bool:
+        if self.is_hard:
+            # The windows are already blocked for the faculty members
+            model.model.objective_offset += model.share(self.constraint)
+        else:
+            model.penalize_faculty_slots(self.unavailable, self.constraint)
+        return True
+
+class FacultyWindowsTracker(RuleTracker):
+    tracks_entries = True
+
+    def __init__(self, rule: FacultyWindowsRule, state: FitnessState):
+        super().__init__(rule, state)
+        self.violations = 0
+
+    def update(self, index: int, sign: int):
+        if self.rule.violates(self.state.slot_idx[index], self.state.faculty_idx[index]):
+            self.violations += sign
+
+    def score(self) -> float:
+        return 1.0 - (self.violations / max(len(self.state), 1))
+
+@register_constraint("Max Consecutive Classes")
+class MaxConsecutiveRule(GroupedRule):
+    """
+    A batch should not have more than max_consecutive back-to-back classes on a day
+    parameters: {"max_consecutive": 3}; a break slot ends a run. The penalty is the
+    number of classes past the limit, per class scheduled.
+    """
+
+    prunes_search = True
+
+    def __init__(self, scorer: TimetableScorer, constraint: Constraint):
+        super().__init__(scorer, constraint)
+        self.limit = int(constraint.parameters.get("max_consecutive", 3))
+
+    def add_model_terms(self, model) -> bool:
+        if not self.is_hard:
+            return False
+        model.limit_batch_runs(self.limit)
+        model.model.objective_offset += model.share(self.constraint)
+        return True
+
+    def group_key(self, row: Tuple[int, ...]) -> Optional[tuple]:
+        slot, batch = row[0], row[1]
+        return (batch, self.scorer.slot_days[slot]) if slot >= 0 and batch >= 0 else None
+
+    def group_penalty(self, rows: List[Tuple[int, ...]]) -> Tuple[int, int]:
+        runs = rank_runs(self.scorer.slot_ranks[row[0]] for row in rows)
+        return sum(max(run - self.limit, 0) for run in runs), len(rows)
+
+    def blocked_slots(self, occupancy: OccupancyIndex, batch_id: str, subject_id: str) -> int:
+        busy = occupancy.batch_mask(batch_id)
+        blocked = 0
+        if not busy:
+            return blocked
+        
+        for codes in self.scorer.day_slots.values():
+            # Length of the busy run ending just before / starting just after each slot
+            taken = [busy >> code & 1 for code in codes]
+            before = [0] * len(codes)
+            for rank in range(1, len(codes)):
+                before[rank] = before[rank - 1] + 1 if taken[rank - 1] else 0
+            after = 0
+            for rank in range(len(codes) - 1, -1, -1):
+                if not taken[rank] and before[rank] + after + 1 > self.limit:
+                    blocked |= 1 << codes[rank]
+                after = after + 1 if taken[rank] else 0
+        return blocked
+
+    def blocks_session(self, occupancy: OccupancyIndex, batch_id: str, subject_id: str, cover: int) -> bool:
+        taken = occupancy.batch_mask(batch_id) | cover
+        for codes in self.scorer.day_slots.values():
+            run = 0
+            touches_cover = False
+            for code in codes + [None]:
+                if code is not None and taken >> code & 1:
+                    run += 1
+                    touches_cover = touches_cover or bool(cover >> code & 1)
+                    continue
+                if touches_cover and run > self.limit:
+                    return True
+                run = 0
+                touches_cover = False
+        return False
+
+@register_constraint("Lab Contiguous Blocks")
+class LabBlockRule(GroupedRule):
+    """
+    Classes of a lab subject that a batch has on the same day should form one contiguous block
+    The penalty is the number of extra blocks per lab class scheduled.
+    """
+
+    prunes_search = True
+
+    def __init__(self, scorer: TimetableScorer, constraint: Constraint):
+        super().__init__(scorer, constraint)
+        self.lab_subjects = {code for code, requires_lab in enumerate(scorer.subject_labs) if requires_lab}
+        self.lab_subject_ids = {subject_id for subject_id, code in scorer.subject_codes.items() if code in self.lab_subjects}
+
+    def add_model_terms(self, model) -> bool:
+        if not self.is_hard:
+            return False
+        model.limit_group_runs(self.lab_subject_ids)
+        model.model.objective_offset += model.share(self.constraint)
+        return True
+
+    def group_key(self, row: Tuple[int, ...]) -> Optional[tuple]:
+        slot, batch, subject = row[0], row[1], row[4]
+        if slot < 0 or batch < 0 or subject not in self.lab_subjects:
+            return None
+        return (batch, subject, self.scorer.slot_days[slot])
+
+    def group_penalty(self, rows: List[Tuple[int, ...]]) -> Tuple[int, int]:
+        runs = rank_runs(self.scorer.slot_ranks[row[0]] for row in rows)
+        return len(runs) - 1, len(rows)
+
+    def blocked_slots(self, occupancy: OccupancyIndex, batch_id: str, subject_id: str) -> int:
+        taken = occupancy.group_mask(batch_id, subject_id)
+        if not taken or subject_id not in self.lab_subject_ids:
+            return 0
+        
+        blocked = 0
+        for codes in self.scorer.day_slots.values():
+            ranks = [rank for rank, code in enumerate(codes) if taken >> code & 1]
+            if not ranks:
+                continue
+            # Only the slots on either side of the day's block extend it
+            allowed = 0
+            if len(rank_runs(ranks)) == 1:
+                for rank in (ranks[0] - 1, ranks[-1] + 1):
+                    if 0 <= rank < len(codes):
+                        allowed |= 1 << codes[rank]
+            for code in codes:
+                if not allowed >> code & 1:
+                    blocked |= 1 << code
+        return blocked
+
+    def blocks_session(self, occupancy: OccupancyIndex, batch_id: str, subject_id: str, cover: int) -> bool:
+        if subject_id not in self.lab_subject_ids:
+            return False
+        taken = occupancy.group_mask(batch_id, subject_id) | cover
+        for codes in self.scorer.day_slots.values():
+            if any(cover >> code & 1 for code in codes):
+                return len(rank_runs(rank for rank, code in enumerate(codes) if taken >> code & 1)) > 1
+        return False
+
+@register_constraint("Minimize Classroom Changes")
+class ClassroomChangesRule(GroupedRule):
+    """A batch should stay in the same classroom between its classes of a day"""
+
+    def group_key(self, row: Tuple[int, ...]) -> Optional[tuple]:
+        slot, batch = row[0], row[1]
+        return (batch, self.scorer.slot_days[slot]) if slot >= 0 and batch >= 0 else None
+
+    def group_penalty(self, rows: List[Tuple[int, ...]]) -> Tuple[int, int]:
+        rows = sorted(rows, key=lambda row: (self.scorer.slot_ranks[row[0]], row[5]))
+        changes = sum(1 for current, following in zip(rows, rows[1:]) if current[3] != following[3])
+        return changes, len(rows) - 1
 
 class TimetableGenerator:
-    def __init__(self):
+    # Construction strategies: MRV + forward checking, plain randomized backtracking, greedy + repair
+    SEARCH_STRATEGIES = ("mrv", "randomized", "greedy_repair")
+    # Solving backends: the built-in search, or an installed exact solver (see timetable_exact)
+    # with the built-in search as fallback
+    SOLVER_BACKENDS = ("search", "exact")
+
+    def __init__(self, seed: Optional[int] = None):
+        self.seed = seed
+        self.rng = random.Random(seed)
         self.time_slots: List[TimeSlot] = []
         self.classrooms: List[Classroom] = []
         self.subjects: List[Subject] = []
         self.faculty: List[Faculty] = []
         self.batches: List[Batch] = []
         self.constraints: List[Constraint] = []
+        # Parsed problem data the loaded lists are a view of (see load_catalog)
+        self.catalog: Optional[ProblemCatalog] = None
         self.timetable: List[TimetableEntry] = []
+        self.slot_days: Dict[str, int] = {}
+        self.slot_positions: Dict[str, int] = {}
+        self.day_masks: Dict[int, int] = {}
+        self.teaching_slot_mask = 0
+        self.faculty_limits: Dict[str, Tuple[int, int]] = {}
+        self.slots_by_id: Dict[str, TimeSlot] = {}
+        self.classrooms_by_id: Dict[str, Classroom] = {}
+        self.subjects_by_id: Dict[str, Subject] = {}
+        self.faculty_by_id: Dict[str, Faculty] = {}
+        self.batches_by_id: Dict[str, Batch] = {}
+        self.qualified_faculty: Dict[str, List[Faculty]] = {}
+        self.suitable_classrooms: Dict[Tuple[str, str], List[Classroom]] = {}
+        # Multi-slot sessions: slots per session of each subject, and per session length the
+        # blocks of back-to-back teaching slots (start position -> covered slots bitmask)
+        # and the starts whose block covers each slot position
+        self.session_lengths: Dict[str, int] = {}
+        self.block_covers: Dict[int, Dict[int, int]] = {}
+        self.block_starts_covering: Dict[int, Dict[int, int]] = {}
+        self.slot_runs: List[List[int]] = []  # runs of back-to-back teaching slot positions
+        # classroom_id -> slot ids where the room may not be used (e.g. reserved by another department)
+        self.classroom_unavailability: Dict[str, Set[str]] = {}
+        self.feasibility_report: Optional[FeasibilityReport] = None
+        self.scorer: Optional[TimetableScorer] = None
+        # Constraints compiled against the current catalog; hard rules that prune the search
+        self.constraint_rules: Optional[Dict[str, ConstraintRule]] = None
+        self.search_rules: List[ConstraintRule] = []
+        self.reported_constraints: Set[str] = set()  # names already reported as unregistered
+        self.fitness_state: Optional[FitnessState] = None
+        self.best_solution: Optional[Tuple[List[TimetableEntry], float]] = None
+        # Complete timetables of earlier runs, reused when the same problem is solved again
+        self.solution_cache: Optional[SolutionCache] = None
+        self.exact_workers: Optional[int] = None  # CP-SAT search workers of the exact backend; None: one per CPU
+        # Warm-start hint: (batch_id, subject_id) -> start positions of the hinted sessions,
+        # and (batch_id, subject_id, start position) -> hinted (faculty_id, classroom_id)
+        self.hint_starts: Dict[Tuple[str, str], int] = {}
+        self.hint_resources: Dict[Tuple[str, str, int], Tuple[str, str]] = {}
+        # Progress reporting and cooperative cancellation (e.g. for background jobs)
+        self.on_progress: Optional[Callable[[Dict], None]] = None
+        self.stop_requested: Optional[Callable[[], bool]] = None
+        self.progress_interval = 0.5  # seconds between progress reports
+        self.last_progress_report = 0.0
+        # Metrics of the last generate/repair run; timings and profiling cost time, so they are opt-in
+        self.metrics = SolverMetrics()
+        self.collect_timings = False
+        self.profile = False
+        self.occupancy = OccupancyIndex(self.slot_positions, self.slot_days, self.day_masks, self.faculty_limits)
         
-    def load_data(self, data: Dict):
-        """Load all data from the database"""
-        # Load time slots
-        self.time_slots = [
-            TimeSlot(**slot) for slot in data.get('time_slots', [])
-        ]
+    def load_data(self, data: Dict, department_id: Optional[str] = None):
+        """
+        Load all data from the database
+        With a department_id only that department's subjects, faculty and batches are
+        built; filter_by_department can switch to another department later.
+        """
+        self.load_catalog(ProblemCatalog(data), department_id)
+
+    def load_catalog(self, catalog: ProblemCatalog, department_id: Optional[str] = None):
+        """Load one department's view of a shared catalog, or the whole catalog without a department"""
+        self.load_snapshot(catalog.view(department_id))
+        self.catalog = catalog
+
+    def load_snapshot(self, snapshot: ProblemSnapshot):
+        """Load a problem from an immutable snapshot (entities are shared, not copied)"""
+        self.catalog = None
+        self.time_slots = list(snapshot.time_slots)
+        self.classrooms = list(snapshot.classrooms)
+        self.subjects = list(snapshot.subjects)
+        self.faculty = list(snapshot.faculty)
+        self.batches = list(snapshot.batches)
+        self.constraints = list(snapshot.constraints)
+        self.build_lookup_tables()
+
+    def create_snapshot(self, department_id: Optional[str] = None) -> ProblemSnapshot:
+        """Immutable snapshot of the loaded problem, filtered to a department if given"""
+        subjects, faculty, batches = self.subjects, self.faculty, self.batches
+        if department_id:
+            subjects = [s for s in subjects if s.department_id == department_id]
+            faculty = [f for f in faculty if f.department_id == department_id]
+            batches = [b for b in batches if b.department_id == department_id]
         
-        # Load classrooms
-        self.classrooms = [
-            Classroom(**classroom) for classroom in data.get('classrooms', [])
-        ]
+        return ProblemSnapshot(
+            time_slots=tuple(self.time_slots),
+            classrooms=tuple(self.classrooms),
+            subjects=tuple(subjects),
+            faculty=tuple(faculty),
+            batches=tuple(batches),
+            constraints=tuple(self.constraints),
+        )
+
+    def problem_hash(self) -> str:
+        """
+        sha256 of the canonical JSON of the loaded (and filtered) problem
+        Id lists within records are sorted, and so are the records of every table, so
+        the same problem hashes the same whatever order it was loaded in.
+        """
+        def canonical(item) -> str:
+            record = {
+                key: sorted(value) if isinstance(value, list) else value
+                for key, value in asdict(item).items()
+            }
+            return json.dumps(record, sort_keys=True, separators=(",", ":"), default=str)
         
-        # Load subjects
-        self.subjects = [
-            Subject(**subject) for subject in data.get('subjects', [])
-        ]
+        problem = {
+            name: sorted(canonical(item) for item in items)
+            for name, items in (
+                ("time_slots", self.time_slots), ("classrooms", self.classrooms), ("subjects", self.subjects),
+                ("faculty", self.faculty), ("batches", self.batches), ("constraints", self.constraints),
+            )
+        }
+        problem["classroom_unavailability"] = {
+            classroom_id: sorted(slot_ids) for classroom_id, slot_ids in self.classroom_unavailability.items()
+        }
+        encoded = json.dumps(problem, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def solution_key(self, strategy: str, optimizer_config: Optional[OptimizerConfig],
+                     backend: str = "search") -> str:
+        """
+        Solution cache key: the problem hash plus everything else that shapes the result
+        Only meaningful for a seeded generator; unseeded runs are not cached (see generate_timetable).
+        """
+        settings = {
+            "problem": self.problem_hash(),
+            "strategy": strategy,
+            "backend": backend,
+            "seed": self.seed,
+            "optimizer": asdict(optimizer_config) if optimizer_config else None,
+        }
+        return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def reseed(self, seed: Optional[int]):
+        """Restart the random generator, e.g. to solve another option on a warm generator"""
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+    def set_warm_start(self, entries: Optional[List[TimetableEntry]]):
+        """
+        Use a previous timetable (e.g. last semester's) as a value-ordering hint
+        The search tries the start slots of its sessions first for their batch and subject,
+        with their faculty member and classroom while those are still free, so a similar
+        problem mostly confirms the old placement. Entries outside the catalog are ignored.
+        """
+        self.hint_starts = {}
+        self.hint_resources = {}
+        known_entries = [entry for entry in entries or [] if entry.time_slot_id in self.slot_positions]
         
-        # Load faculty
-        self.faculty = [
-            Faculty(**fac) for fac in data.get('faculty', [])
-        ]
+        for session in self.split_sessions(known_entries):
+            entry = session[0]
+            if len(session) != self.session_length(entry.subject_id):
+                continue
+            position = self.slot_positions[entry.time_slot_id]
+            group = (entry.batch_id, entry.subject_id)
+            self.hint_starts[group] = self.hint_starts.get(group, 0) | 1 << position
+            self.hint_resources[(entry.batch_id, entry.subject_id, position)] = (entry.faculty_id, entry.classroom_id)
+
+    def build_lookup_tables(self):
+        """Precompute id maps, slot bitmasks, qualified faculty and eligible rooms for the loaded catalog"""
+        self.slots_by_id = self.index_by_id(self.time_slots)
+        self.classrooms_by_id = self.index_by_id(self.classrooms)
+        self.subjects_by_id = self.index_by_id(self.subjects)
+        self.faculty_by_id = self.index_by_id(self.faculty)
+        self.batches_by_id = self.index_by_id(self.batches)
         
-        # Load batches
-        self.batches = [
-            Batch(**batch) for batch in data.get('batches', [])
-        ]
+        self.slot_days = {slot.id: slot.day_of_week for slot in self.time_slots}
+        self.slot_positions = {slot.id: position for position, slot in enumerate(self.time_slots)}
         
-        # Load constraints
-        self.constraints = [
-            Constraint(
-                name=c['name'],
-                type=ConstraintType(c['type']),
-                weight=c['weight'],
-                description=c['description']
-            ) for c in data.get('constraints', [])
-        ]
+        # Slot bitmasks: non-break slots and slots of each day
+        self.day_masks = {}
+        self.teaching_slot_mask = 0
+        for position, slot in enumerate(self.time_slots):
+            self.day_masks[slot.day_of_week] = self.day_masks.get(slot.day_of_week, 0) | (1 << position)
+            if not slot.is_break:
+                self.teaching_slot_mask |= 1 << position
+        
+        self.faculty_limits = {
+            f.id: (f.max_classes_per_day, f.max_classes_per_week) for f in self.faculty
+        }
+        
+        self.build_block_tables()
+        
+        # Subject -> faculty who can teach it, in catalog order
+        self.qualified_faculty = {}
+        for faculty_member in self.faculty:
+            for subject_id in faculty_member.subjects:
+                self.qualified_faculty.setdefault(subject_id, []).append(faculty_member)
+        
+        # (batch, subject) -> eligible classrooms, tightest capacity fit first
+        self.suitable_classrooms = {}
+        for batch in self.batches:
+            for subject_id in batch.subjects:
+                self.suitable_classrooms[(batch.id, subject_id)] = self.find_suitable_classrooms(batch.id, subject_id)
+        
+        self.scorer = None
+        self.constraint_rules = None
+        self.reset_timetable()
 
-    def generate_timetable(self, department_id: Optional[str] = None) -> Tuple[List[TimetableEntry], float]:
+    def build_block_tables(self):
+        """
+        Precompute session lengths and the slot blocks multi-slot sessions can take
+        A subject longer than the standard (most common) teaching slot needs
+        ceil(duration / standard) back-to-back slots: non-break slots of one day and
+        shift with consecutive slot numbers.
+        """
+        lengths: Dict[int, int] = {}
+        for slot in self.time_slots:
+            start, end = clock_minutes(slot.start_time), clock_minutes(slot.end_time)
+            if not slot.is_break and start is not None and end is not None and end > start:
+                lengths[end - start] = lengths.get(end - start, 0) + 1
+        standard_minutes = max(lengths, key=lambda minutes: (lengths[minutes], minutes)) if lengths else 60
+        self.session_lengths = {
+            subject.id: max(math.ceil(subject.duration_minutes / standard_minutes), 1) for subject in self.subjects
+        }
+        
+        # Runs of back-to-back teaching slots
+        shifts: Dict[Tuple[int, str], List[int]] = {}
+        for position, slot in enumerate(self.time_slots):
+            shifts.setdefault((slot.day_of_week, slot.shift), []).append(position)
+        runs = self.slot_runs = []
+        for positions in shifts.values():
+            run: List[int] = []
+            previous = None
+            for position in sorted(positions, key=lambda position: self.time_slots[position].slot_number):
+                slot = self.time_slots[position]
+                if slot.is_break or (previous is not None and slot.slot_number != previous + 1):
+                    if run:
+                        runs.append(run)
+                    run = []
+                if not slot.is_break:
+                    run.append(position)
+                previous = slot.slot_number
+            if run:
+                runs.append(run)
+        
+        self.block_covers = {}
+        self.block_starts_covering = {}
+        for length in set(self.session_lengths.values()) - {1}:
+            covers: Dict[int, int] = {}
+            covering: Dict[int, int] = {}
+            for run in runs:
+                for first in range(len(run) - length + 1):
+                    block = run[first:first + length]
+                    covers[block[0]] = sum(1 << position for position in block)
+                    for position in block:
+                        covering[position] = covering.get(position, 0) | (1 << block[0])
+            self.block_covers[length] = covers
+            self.block_starts_covering[length] = covering
+
+    def count_free_blocks(self, busy: int, length: int) -> int:
+        """Most disjoint blocks of length back-to-back slots that avoid the busy slot bitmask"""
+        count = 0
+        for run in self.slot_runs:
+            free = 0
+            for position in run:
+                free = 0 if busy >> position & 1 else free + 1
+                if free == length:
+                    count += 1
+                    free = 0
+        return count
+
+    def session_length(self, subject_id: str) -> int:
+        """Number of back-to-back slots one session of a subject takes"""
+        return self.session_lengths.get(subject_id, 1)
+
+    def count_required_entries(self) -> int:
+        """Number of timetable entries a complete timetable has (one per slot of every session)"""
+        return sum(self.session_length(subject_id) for _, subject_id in self.get_required_assignments())
+
+    @staticmethod
+    def index_by_id(items: list) -> Dict[str, object]:
+        """Map id -> item; the first item with a given id wins, as with next(...) lookups"""
+        index = {}
+        for item in items:
+            index.setdefault(item.id, item)
+        return index
+
+    def reset_timetable(self, entries: Optional[List[TimetableEntry]] = None):
+        """Replace the current timetable and rebuild the occupancy index"""
+        self.timetable = []
+        self.fitness_state = None
+        self.occupancy = OccupancyIndex(self.slot_positions, self.slot_days, self.day_masks, self.faculty_limits)
+        for classroom_id, slot_ids in self.classroom_unavailability.items():
+            mask = 0
+            for slot_id in slot_ids:
+                if slot_id in self.slot_positions:
+                    mask |= 1 << self.slot_positions[slot_id]
+            self.occupancy.block_classroom(classroom_id, mask)
+        for rule in self.get_constraint_rules().values():
+            if rule.is_hard:
+                for faculty_id, mask in rule.faculty_unavailability().items():
+                    self.occupancy.block_faculty(faculty_id, mask)
+        for entry in entries or []:
+            self.add_entry(entry)
+
+    def add_entry(self, entry: TimetableEntry):
+        """Append an entry to the timetable, keeping the occupancy index in sync"""
+        self.timetable.append(entry)
+        self.occupancy.assign(entry)
+        self.fitness_state = None
+
+    def add_entries(self, entries: List[TimetableEntry]):
+        """Append the entries of a session"""
+        for entry in entries:
+            self.add_entry(entry)
+
+    def remove_entries(self, entries: List[TimetableEntry]):
+        """Remove several entries in one pass over the timetable"""
+        removed = {id(entry) for entry in entries}
+        self.timetable = [entry for entry in self.timetable if id(entry) not in removed]
+        for entry in entries:
+            self.occupancy.unassign(entry)
+        self.fitness_state = None
+
+    def remove_entry(self, entry: TimetableEntry):
+        """Remove an entry from the timetable, keeping the occupancy index in sync"""
+        # Backtracking always undoes the most recent assignment first
+        if self.timetable and self.timetable[-1] is entry:
+            self.timetable.pop()
+        else:
+            self.timetable.remove(entry)
+        self.occupancy.unassign(entry)
+        self.fitness_state = None
+
+    @instrumented_run
+    def generate_timetable(self, department_id: Optional[str] = None,
+                           optimizer_config: Optional[OptimizerConfig] = None,
+                           time_limit: Optional[float] = None,
+                           strategy: str = "mrv",
+                           warm_start: Optional[List[TimetableEntry]] = None,
+                           backend: str = "search") -> Tuple[List[TimetableEntry], float]:
         """
         Generate optimized timetable using constraint satisfaction
+        strategy is one of SEARCH_STRATEGIES and backend one of SOLVER_BACKENDS; the exact
+        backend falls back to strategy when no exact solver is installed. With
+        optimizer_config, the first complete timetable is improved by local search.
+        time_limit (seconds) bounds the whole run.
+        warm_start is a previous timetable tried first (see set_warm_start). With a
+        solution_cache, a problem solved before with the same settings is not solved again;
+        an unseeded generator (seed None) bypasses it, as each of its runs is a fresh draw.
         Returns: (timetable_entries, fitness_score)
         """
+        if strategy not in self.SEARCH_STRATEGIES:
+            raise ValueError(f"Unknown search strategy: {strategy}")
+        if backend not in self.SOLVER_BACKENDS:
+            raise ValueError(f"Unknown solver backend: {backend}")
+        
         print(f"[v0] Starting timetable generation for department: {department_id}")
         
         # Filter data by department if specified
         if department_id:
             self.filter_by_department(department_id)
         
+        use_cache = self.solution_cache is not None and self.seed is not None
+        cache_key = self.solution_key(strategy, optimizer_config, backend) if use_cache else None
+        cached = self.solution_cache.get(cache_key) if cache_key else None
+        if cached:
+            entries, fitness_score = cached
+            self.reset_timetable(entries)
+            self.feasibility_report = FeasibilityReport(True, [], 0.0)
+            self.metrics.cache_hit = True
+            print(f"[v0] Reusing cached timetable with fitness score: {fitness_score}")
+            self.report_progress("done", fitness_score, force=True)
+            return self.timetable, fitness_score
+        
         # Initialize empty timetable
-        self.timetable = []
+        self.reset_timetable()
+        self.set_warm_start(warm_start)
         
         # Get all required class assignments
         required_assignments = self.get_required_assignments()
         print(f"[v0] Total required assignments: {len(required_assignments)}")
         
-        # Use backtracking with constraint propagation
-        success = self.backtrack_schedule(required_assignments, 0)
+        # Cheap bounds first, so an infeasible problem never reaches the exponential search
+        self.feasibility_report = self.check_feasibility(required_assignments)
+        
+        deadline = time.monotonic() + time_limit if time_limit is not None else None
+        if not self.feasibility_report.feasible:
+            for issue in self.feasibility_report.issues:
+                print(f"[v0] Infeasible: {issue.description}")
+            # Best-effort partial timetable without search
+            self.greedy_schedule(required_assignments)
+            self.metrics.solution_status = "infeasible"
+            success = False
+        elif backend == "exact":
+            success = self.exact_schedule(required_assignments, deadline, strategy)
+        else:
+            success = self.search_schedule(required_assignments, deadline, strategy)
+        if self.metrics.solution_status is None:
+            self.metrics.solution_status = "feasible" if success else "unknown"
         
         if success:
-            fitness_score = self.calculate_fitness()
+            if optimizer_config:
+                if deadline is not None:
+                    remaining_time = max(deadline - time.monotonic(), 0.0)
+                    optimizer_config = replace(optimizer_config, time_budget=min(optimizer_config.time_budget, remaining_time))
+                _, fitness_score = self.optimize_timetable(optimizer_config)
+            else:
+                fitness_score = self.calculate_fitness()
             print(f"[v0] Timetable generated successfully with fitness score: {fitness_score}")
+            if cache_key:
+                self.solution_cache.put(cache_key, self.timetable, fitness_score)
+            self.report_progress("done", fitness_score, force=True)
             return self.timetable, fitness_score
         else:
             print("[v0] Failed to generate complete timetable")
+            self.report_progress("done", 0.0, force=True)
             # Return partial solution with penalty
             return self.timetable, 0.0
 
+    def search_schedule(self, assignments: List[Tuple[str, str]], deadline: Optional[float], strategy: str) -> bool:
+        """Place assignments with the built-in search of a strategy"""
+        if strategy == "greedy_repair":
+            unplaced = self.greedy_schedule(assignments)
+            return self.repair_schedule(unplaced, deadline)
+        # Use backtracking with constraint propagation
+        return self.backtrack_schedule(assignments, deadline=deadline, most_constrained_first=(strategy == "mrv"))
+
+    def exact_schedule(self, assignments: List[Tuple[str, str]], deadline: Optional[float], strategy: str) -> bool:
+        """
+        Place assignments with an installed exact solver, or the built-in search without one
+        The solver's timetable is replayed through the hard-constraint checks; sessions that
+        break a rule the model leaves out are re-placed by repair, and the timetable is then
+        no longer proven optimal. A solver stopped before finding anything hands the rest
+        of the time to the built-in search.
+        """
+        from timetable_exact import solve_exact  # imported here: the solver dependencies are optional
+        
+        result = solve_exact(self, deadline, workers=self.exact_workers)
+        if result is None:
+            print("[v0] No exact solver installed, using the built-in search")
+            return self.search_schedule(assignments, deadline, strategy)
+        
+        print(f"[v0] Exact solver {result.solver}: {result.status}, objective {result.objective}, bound {result.bound}")
+        metrics = self.metrics
+        metrics.backend, metrics.solution_status = result.solver, result.status
+        metrics.objective, metrics.objective_bound = result.objective, result.bound
+        if result.status == "infeasible":
+            self.greedy_schedule(assignments)
+            return False
+        if not result.entries:
+            metrics.backend, metrics.solution_status = "search", None
+            return self.search_schedule(assignments, deadline, strategy)
+        
+        unplaced = []
+        for session in self.split_sessions(result.entries):
+            if self.is_session_placeable(session):
+                self.add_entries(session)
+            else:
+                unplaced.append((session[0].batch_id, session[0].subject_id))
+        if not unplaced:
+            return True
+        
+        print(f"[v0] {len(unplaced)} sessions break constraints outside the exact model, repairing them")
+        metrics.solution_status = None
+        return self.repair_schedule(unplaced, deadline)
+
+    @instrumented_run
+    def repair_timetable(self, entries: List[TimetableEntry], change_set: Optional[ChangeSet] = None,
+                         department_id: Optional[str] = None, time_limit: Optional[float] = None) -> RepairResult:
+        """
+        Repair an existing timetable after small catalog changes
+        Entries that are still valid stay pinned; only entries touching removed
+        faculty, classrooms or slots (or no longer required) are unassigned, and the
+        missing classes are re-solved around the pinned timetable, widening to their
+        conflict neighbourhood only when needed.
+        """
+        change_set = change_set or ChangeSet()
+        print(f"[v0] Repairing timetable of {len(entries)} entries for department: {department_id}")
+        
+        if department_id:
+            self.filter_by_department(department_id)
+        
+        # Solve on the catalog without the removed resources; the full one is loaded again afterwards
+        original, catalog = self.create_snapshot(), self.catalog
+        removed_faculty = set(change_set.removed_faculty)
+        removed_classrooms = set(change_set.removed_classrooms)
+        removed_slots = set(change_set.removed_time_slots)
+        self.load_snapshot(replace(
+            original,
+            faculty=tuple(f for f in original.faculty if f.id not in removed_faculty),
+            classrooms=tuple(c for c in original.classrooms if c.id not in removed_classrooms),
+            time_slots=tuple(ts for ts in original.time_slots if ts.id not in removed_slots),
+        ))
+        try:
+            result = self.repair_reduced_timetable(entries, change_set, time_limit)
+        finally:
+            repaired = self.timetable
+            self.load_snapshot(original)
+            self.catalog = catalog
+            self.reset_timetable(repaired)
+        return result
+
+    def repair_reduced_timetable(self, entries: List[TimetableEntry], change_set: ChangeSet,
+                                 time_limit: Optional[float]) -> RepairResult:
+        """repair_timetable on the loaded catalog, with the removed resources already left out"""
+        required_assignments = self.get_required_assignments()
+        for batch_id, subject_id in change_set.added_subjects:
+            batch = self.batches_by_id.get(batch_id)
+            subject = self.subjects_by_id.get(subject_id)
+            if batch and subject and subject_id not in batch.subjects:
+                required_assignments.extend([(batch_id, subject_id)] * subject.classes_per_week)
+        
+        missing: Dict[Tuple[str, str], int] = {}
+        for assignment in required_assignments:
+            missing[assignment] = missing.get(assignment, 0) + 1
+        
+        # Pin every original session that is still valid (copies: re-rooming mutates entries)
+        for session in self.split_sessions(entries):
+            entry = session[0]
+            group = (entry.batch_id, entry.subject_id)
+            faculty_member = self.faculty_by_id.get(entry.faculty_id)
+            if (
+                missing.get(group, 0) > 0
+                and len(session) == self.session_length(entry.subject_id)
+                and faculty_member is not None and entry.subject_id in faculty_member.subjects
+                and entry.classroom_id in self.classrooms_by_id
+                and self.is_session_placeable(session)
+            ):
+                self.add_entries([replace(e) for e in session])
+                missing[group] -= 1
+        
+        unplaced = [group for group, count in missing.items() for _ in range(count)]
+        print(f"[v0] Kept {len(self.timetable)} entries, re-solving {len(unplaced)} assignments")
+        
+        deadline = time.monotonic() + time_limit if time_limit is not None else None
+        complete = self.repair_schedule(unplaced, deadline)
+        if not complete:
+            # Keep as much of the timetable as fits instead of only the pinned entries
+            missing = {}
+            for assignment in required_assignments:
+                missing[assignment] = missing.get(assignment, 0) + 1
+            for session in self.split_sessions(self.timetable):
+                missing[(session[0].batch_id, session[0].subject_id)] -= 1
+            self.greedy_schedule([group for group, count in missing.items() for _ in range(count)])
+        fitness_score = self.calculate_fitness() if complete else 0.0
+        
+        original = {(e.time_slot_id, e.batch_id, e.subject_id, e.faculty_id, e.classroom_id) for e in entries}
+        kept = sum(
+            1 for e in self.timetable
+            if (e.time_slot_id, e.batch_id, e.subject_id, e.faculty_id, e.classroom_id) in original
+        )
+        
+        return RepairResult(
+            entries=self.timetable,
+            fitness=fitness_score,
+            complete=complete,
+            kept_entries=kept,
+            changed_entries=len(self.timetable) - kept,
+            removed_entries=len(entries) - kept,
+            metrics=self.metrics,
+        )
+
+    def check_feasibility(self, assignments: Optional[List[Tuple[str, str]]] = None) -> FeasibilityReport:
+        """
+        Pre-solve analysis of the assignments still to place (all required ones by default)
+        Checks counting bounds per batch, subjects without qualified faculty, classes no
+        classroom fits, sessions no slot block fits, and max-flow (Hall) bounds on faculty
+        and classroom capacity. Demand is counted in slots, so a two-slot lab counts twice.
+        Every issue found proves that no complete timetable exists.
+        """
+        started = time.perf_counter()
+        if assignments is None:
+            assignments = self.get_required_assignments()
+        issues: List[FeasibilityIssue] = []
+        
+        group_demand: Dict[Tuple[str, str], int] = {}
+        for assignment in assignments:
+            group_demand[assignment] = group_demand.get(assignment, 0) + self.session_length(assignment[1])
+        batch_demand: Dict[str, int] = {}
+        subject_demand: Dict[str, int] = {}
+        for (batch_id, subject_id), count in group_demand.items():
+            batch_demand[batch_id] = batch_demand.get(batch_id, 0) + count
+            subject_demand[subject_id] = subject_demand.get(subject_id, 0) + count
+        
+        def name(items: Dict[str, object], item_id: str) -> str:
+            item = items.get(item_id)
+            return item.name if item else item_id
+        
+        # A batch attends at most one class per free teaching slot
+        for batch_id, count in batch_demand.items():
+            capacity = (self.teaching_slot_mask & ~self.occupancy.batch_mask(batch_id)).bit_count()
+            if count > capacity:
+                issues.append(FeasibilityIssue(
+                    "batch_overload", "resource_conflict", "critical",
+                    f"Batch {name(self.batches_by_id, batch_id)} needs {count} class slots a week "
+                    f"but has only {capacity} free teaching slots",
+                    [batch_id], count, capacity,
+                ))
+        
+        for subject_id, count in subject_demand.items():
+            if not self.qualified_faculty.get(subject_id):
+                issues.append(FeasibilityIssue(
+                    "no_qualified_faculty", "faculty_overlap", "critical",
+                    f"No faculty member can teach {name(self.subjects_by_id, subject_id)} "
+                    f"({count} class slots a week)",
+                    [subject_id], count, 0,
+                ))
+        
+        for subject_id, count in subject_demand.items():
+            length = self.session_length(subject_id)
+            if length > 1 and not self.block_covers.get(length):
+                issues.append(FeasibilityIssue(
+                    "no_session_block", "resource_conflict", "critical",
+                    f"Sessions of {name(self.subjects_by_id, subject_id)} "
+                    f"({self.subjects_by_id[subject_id].duration_minutes} minutes) need {length} back-to-back "
+                    f"teaching slots, but no day has that many",
+                    [subject_id], count, 0,
+                ))
+        
+        # One issue per batch listing the subjects no classroom suits
+        roomless: Dict[str, List[str]] = {}
+        for (batch_id, subject_id) in group_demand:
+            if not self.get_suitable_classrooms(batch_id, subject_id):
+                roomless.setdefault(batch_id, []).append(subject_id)
+        for batch_id, subject_ids in roomless.items():
+            batch = self.batches_by_id.get(batch_id)
+            issues.append(FeasibilityIssue(
+                "no_suitable_classroom", "classroom_overlap", "critical",
+                f"No classroom fits batch {name(self.batches_by_id, batch_id)} "
+                f"({batch.student_count if batch else '?'} students) for "
+                f"{', '.join(sorted(name(self.subjects_by_id, s) for s in subject_ids))}",
+                [batch_id] + sorted(subject_ids), sum(group_demand[(batch_id, s)] for s in subject_ids), 0,
+            ))
+        
+        # Faculty capacity: classes per week within the weekly limit, the daily limit and free slots
+        teaching_days = {self.slot_days[slot.id] for slot in self.time_slots if not slot.is_break}
+        faculty_capacity = {
+            f.id: max(min(
+                f.max_classes_per_week - self.occupancy.faculty_week_count(f.id),
+                f.max_classes_per_day * len(teaching_days),
+                (self.teaching_slot_mask & ~self.occupancy.faculty_blocked_mask(f.id)).bit_count(),
+            ), 0)
+            for f in self.faculty
+        }
+        staffed = {subject_id: count for subject_id, count in subject_demand.items() if self.qualified_faculty.get(subject_id)}
+        flow, subjects, faculty_ids = bipartite_max_flow(
+            staffed, faculty_capacity,
+            {subject_id: [f.id for f in self.qualified_faculty[subject_id]] for subject_id in staffed},
+        )
+        if flow < sum(staffed.values()):
+            demand = sum(staffed[subject_id] for subject_id in subjects)
+            capacity = sum(faculty_capacity[faculty_id] for faculty_id in faculty_ids)
+            issues.append(FeasibilityIssue(
+                "faculty_capacity", "faculty_overlap", "high",
+                f"Faculty who can teach {', '.join(sorted(name(self.subjects_by_id, s) for s in subjects))} "
+                f"can take {capacity} class slots a week, but {demand} are needed",
+                sorted(subjects) + sorted(faculty_ids), demand, capacity,
+            ))
+        
+        # Classroom capacity: groups with the same eligible rooms are merged into one demand node
+        room_capacity = {
+            c.id: (self.teaching_slot_mask & ~self.occupancy.classroom_mask(c.id)).bit_count() for c in self.classrooms
+        }
+        room_sets: Dict[frozenset, int] = {}
+        room_set_batches: Dict[frozenset, Set[str]] = {}
+        for (batch_id, subject_id), count in group_demand.items():
+            rooms = frozenset(c.id for c in self.get_suitable_classrooms(batch_id, subject_id))
+            if rooms:
+                room_sets[rooms] = room_sets.get(rooms, 0) + count
+                room_set_batches.setdefault(rooms, set()).add(batch_id)
+        flow, short_sets, room_ids = bipartite_max_flow(room_sets, room_capacity, {rooms: rooms for rooms in room_sets})
+        if flow < sum(room_sets.values()):
+            demand = sum(room_sets[rooms] for rooms in short_sets)
+            capacity = sum(room_capacity[room_id] for room_id in room_ids)
+            batch_ids = sorted(set().union(*(room_set_batches[rooms] for rooms in short_sets)))
+            issues.append(FeasibilityIssue(
+                "classroom_capacity", "classroom_overlap", "high",
+                f"Classrooms {', '.join(sorted(name(self.classrooms_by_id, r) for r in room_ids))} offer "
+                f"{capacity} room-slots a week, but {demand} class slots can only use them",
+                batch_ids + sorted(room_ids), demand, capacity,
+            ))
+        
+        # Multi-slot sessions: a classroom holds only so many disjoint blocks of a session length
+        for length in sorted({self.session_length(subject_id) for _, subject_id in group_demand} - {1}):
+            block_capacity = {
+                c.id: self.count_free_blocks(self.occupancy.classroom_mask(c.id), length) for c in self.classrooms
+            }
+            session_sets: Dict[frozenset, int] = {}
+            session_set_batches: Dict[frozenset, Set[str]] = {}
+            for (batch_id, subject_id), slots in group_demand.items():
+                rooms = frozenset(c.id for c in self.get_suitable_classrooms(batch_id, subject_id))
+                if rooms and self.session_length(subject_id) == length:
+                    session_sets[rooms] = session_sets.get(rooms, 0) + slots // length
+                    session_set_batches.setdefault(rooms, set()).add(batch_id)
+            flow, short_sets, room_ids = bipartite_max_flow(
+                session_sets, block_capacity, {rooms: rooms for rooms in session_sets}
+            )
+            if flow < sum(session_sets.values()):
+                demand = sum(session_sets[rooms] for rooms in short_sets)
+                capacity = sum(block_capacity[room_id] for room_id in room_ids)
+                batch_ids = sorted(set().union(*(session_set_batches[rooms] for rooms in short_sets)))
+                issues.append(FeasibilityIssue(
+                    "session_room_capacity", "classroom_overlap", "high",
+                    f"Classrooms {', '.join(sorted(name(self.classrooms_by_id, r) for r in room_ids))} fit "
+                    f"{capacity} sessions of {length} back-to-back slots a week, but {demand} such sessions "
+                    f"can only use them",
+                    batch_ids + sorted(room_ids), demand, capacity,
+                ))
+        
+        return FeasibilityReport(
+            feasible=not issues,
+            issues=issues,
+            elapsed=time.perf_counter() - started,
+        )
+
     def filter_by_department(self, department_id: str):
-        """Filter all data to specific department"""
+        """
+        Filter all data to specific department
+        With a catalog loaded the department's view is taken from it, so the generator can
+        be switched to another department later; otherwise the loaded lists are filtered.
+        """
+        if self.catalog is not None:
+            self.load_catalog(self.catalog, department_id)
+            return
+        
         self.subjects = [s for s in self.subjects if s.department_id == department_id]
         self.faculty = [f for f in self.faculty if f.department_id == department_id]
         self.batches = [b for b in self.batches if b.department_id == department_id]
         # Keep all classrooms available (can be shared across departments)
+        self.build_lookup_tables()
 
     def get_required_assignments(self) -> List[Tuple[str, str]]:
         """Get all required (batch_id, subject_id) assignments"""
@@ -171,7 +2224,7 @@ class TimetableGenerator:
         
         for batch in self.batches:
             for subject_id in batch.subjects:
-                subject = next((s for s in self.subjects if s.id == subject_id), None)
+                subject = self.subjects_by_id.get(subject_id)
                 if subject:
                     # Add multiple assignments based on classes_per_week
                     for _ in range(subject.classes_per_week):
@@ -179,56 +2232,379 @@ class TimetableGenerator:
         
         return assignments
 
-    def backtrack_schedule(self, assignments: List[Tuple[str, str]], index: int) -> bool:
-        """Backtracking algorithm to schedule classes"""
-        if index >= len(assignments):
+    def backtrack_schedule(self, assignments: List[Tuple[str, str]], index: int = 0,
+                           deadline: Optional[float] = None, most_constrained_first: bool = True) -> bool:
+        """
+        Iterative backtracking search over assignments[index:]
+        Uses most-constrained-first (MRV) variable ordering and forward checking;
+        with most_constrained_first=False assignments are taken in the given order
+        without forward checking (plain randomized backtracking).
+        Identical (batch_id, subject_id) assignments share one slot domain; for multi-slot
+        sessions the domain holds block start positions and each placement is one session.
+        Past the deadline (a time.monotonic() value) the partial timetable is kept and False is returned.
+        """
+        remaining: Dict[Tuple[str, str], int] = {}
+        for assignment in assignments[index:]:
+            remaining[assignment] = remaining.get(assignment, 0) + 1
+        
+        if not remaining:
             return True  # All assignments scheduled
         
-        batch_id, subject_id = assignments[index]
+        domains = self.build_domains(list(remaining))
+        if any(domains[group].bit_count() < count for group, count in remaining.items()):
+            self.metrics.domain_wipeouts += 1
+            return False  # Some assignment has too few valid slots from the start
+        
+        unassigned = sum(remaining.values())
+        trail: List[Tuple[Tuple[str, str], int]] = []
+        # Each frame: [group, candidate slot positions, next candidate index, placed session entries, trail mark]
+        stack: List[list] = [self.open_search_frame(domains, remaining, most_constrained_first)]
+        
+        while stack:
+            if self.search_expired(deadline):
+                print("[v0] Search deadline reached or cancelled")
+                return False
+            if self.on_progress:
+                self.report_progress("search")
+            
+            frame = stack[-1]
+            group, candidates = frame[0], frame[1]
+            
+            if frame[3] is not None:
+                # Backtrack - undo the placement made at this level
+                self.undo_forward_check(domains, trail, frame[4])
+                for entry in reversed(frame[3]):
+                    self.remove_entry(entry)
+                remaining[group] += 1
+                unassigned += 1
+                frame[3] = None
+                self.metrics.backtracks += 1
+            
+            while frame[2] < len(candidates):
+                position = candidates[frame[2]]
+                frame[2] += 1
+                
+                session = self.place_session(group[0], group[1], position)
+                if not session:
+                    continue
+                
+                self.add_entries(session)
+                remaining[group] -= 1
+                unassigned -= 1
+                mark = len(trail)
+                
+                if not most_constrained_first or self.forward_check(session, domains, remaining, trail):
+                    frame[3] = session
+                    frame[4] = mark
+                    self.metrics.nodes_expanded += 1
+                    break
+                
+                # Domain wipeout - try the next candidate
+                self.metrics.domain_wipeouts += 1
+                self.undo_forward_check(domains, trail, mark)
+                for entry in reversed(session):
+                    self.remove_entry(entry)
+                remaining[group] += 1
+                unassigned += 1
+            
+            if frame[3] is None:
+                stack.pop()  # No valid assignment found at this level
+            elif unassigned == 0:
+                return True  # All assignments scheduled
+            else:
+                stack.append(self.open_search_frame(domains, remaining, most_constrained_first))
+        
+        return False
+
+    def search_expired(self, deadline: Optional[float]) -> bool:
+        """True once the deadline (a time.monotonic() value) has passed or a stop was requested"""
+        if deadline is not None and time.monotonic() > deadline:
+            return True
+        return bool(self.stop_requested and self.stop_requested())
+
+    def report_progress(self, phase: str, best_fitness: Optional[float] = None, force: bool = False):
+        """Send a progress event to on_progress, at most once per progress_interval unless forced"""
+        now = time.monotonic()
+        if not self.on_progress or (not force and now - self.last_progress_report < self.progress_interval):
+            return
+        self.last_progress_report = now
+        self.on_progress({
+            "phase": phase,
+            "placed": len(self.timetable),
+            "backtracks": self.metrics.backtracks,
+            "best_fitness": best_fitness,
+        })
+
+    def build_domains(self, groups: List[Tuple[str, str]]) -> Dict[Tuple[str, str], int]:
+        """Build the initial slot bitmask domain of every (batch_id, subject_id) group"""
+        return {group: self.get_available_slot_mask(group[0], group[1]) for group in groups}
+
+    def open_search_frame(self, domains: Dict[Tuple[str, str], int], remaining: Dict[Tuple[str, str], int],
+                          most_constrained_first: bool = True) -> list:
+        """Pick the most constrained unfinished group and create its search frame"""
+        if not most_constrained_first:
+            # Static order; without forward checking the domain is computed fresh
+            group = next(group for group, count in remaining.items() if count > 0)
+            candidates = mask_positions(self.get_available_slot_mask(group[0], group[1]))
+            self.rng.shuffle(candidates)
+            self.order_hinted_first(group, candidates)
+            return [group, candidates, 0, None, 0]
+        
+        best_groups = []
+        best_key = None
+        
+        for group, count in remaining.items():
+            if count == 0:
+                continue
+            
+            # Fewest spare slots first, then smallest domain
+            domain_size = domains[group].bit_count()
+            key = (domain_size - count, domain_size)
+            if best_key is None or key < best_key:
+                best_key = key
+                best_groups = [group]
+            elif key == best_key:
+                best_groups.append(group)
+        
+        group = self.rng.choice(best_groups)
+        candidates = mask_positions(domains[group])
+        
+        # Shuffle for randomization
+        self.rng.shuffle(candidates)
+        
+        # Least constraining first: slots the batch's unplaced multi-slot sessions could use go last,
+        # then days where the subject's faculty have the least workload left
+        reserved = 0
+        if self.block_covers and self.session_length(group[1]) == 1:
+            for other, count in remaining.items():
+                length = self.session_length(other[1])
+                if count and length > 1 and other[0] == group[0]:
+                    for start in mask_positions(domains[other]):
+                        reserved |= self.block_covers[length][start]
+        qualified = self.qualified_faculty.get(group[1], [])
+        day_slack = {
+            day: sum(max(self.occupancy.faculty_slack(f.id, day)[1], 0) for f in qualified)
+            for day in self.day_masks
+        }
+        candidates.sort(key=lambda position: (
+            reserved >> position & 1, -day_slack[self.time_slots[position].day_of_week]
+        ))
+        
+        self.order_hinted_first(group, candidates)
+        return [group, candidates, 0, None, 0]
+
+    def order_hinted_first(self, group: Tuple[str, str], candidates: List[int]):
+        """Move the warm-start start positions of a group to the front, keeping the order otherwise"""
+        hint = self.hint_starts.get(group, 0)
+        if hint:
+            candidates.sort(key=lambda position: not hint >> position & 1)
+
+    def forward_check(self, session: List[TimetableEntry], domains: Dict[Tuple[str, str], int],
+                      remaining: Dict[Tuple[str, str], int], trail: List[Tuple[Tuple[str, str], int]]) -> bool:
+        """
+        Prune slots made infeasible by a newly placed session from every domain
+        Previous domain masks are pushed onto the trail. Returns False on a domain wipeout.
+        """
+        entry = session[0]
+        faculty_member = self.faculty_by_id.get(entry.faculty_id)
+        slot_mask = 0
+        for placed in session:
+            slot_mask |= 1 << self.slot_positions[placed.time_slot_id]
+        
+        # Once the faculty member hits a workload limit, their other slots can change too
+        limit_reached = bool(faculty_member) and (
+            self.occupancy.faculty_day_count(entry.faculty_id, self.slot_days[entry.time_slot_id])
+            >= faculty_member.max_classes_per_day
+            or self.occupancy.faculty_week_count(entry.faculty_id) >= faculty_member.max_classes_per_week
+        )
+        
+        # Hard rules may rule out other slots of the same batch too
+        batch_id = entry.batch_id if self.search_rules else None
+        
+        # Block domains hold start positions: the starts of blocks covering a taken slot
+        touched_starts: Dict[int, int] = {}
+        for length, covering in self.block_starts_covering.items():
+            touched_starts[length] = 0
+            for position in mask_positions(slot_mask):
+                touched_starts[length] |= covering.get(position, 0)
+        
+        for group, domain in domains.items():
+            length = self.session_lengths.get(group[1], 1)
+            if length == 1:
+                if (not domain & slot_mask and not (limit_reached and group[1] in faculty_member.subjects)
+                        and group[0] != batch_id):
+                    continue
+            # Any new class of a qualified faculty member leaves them less room for whole sessions
+            elif (not domain & touched_starts[length] and not (faculty_member and group[1] in faculty_member.subjects)
+                    and group[0] != batch_id):
+                continue
+            
+            pruned = domain & self.get_available_slot_mask(group[0], group[1])
+            if pruned != domain:
+                trail.append((group, domain))
+                domains[group] = pruned
+            
+            if pruned.bit_count() < remaining[group]:
+                return False
+        
+        return True
+
+    def undo_forward_check(self, domains: Dict[Tuple[str, str], int],
+                           trail: List[Tuple[Tuple[str, str], int]], mark: int):
+        """Restore domain masks pruned since the given trail mark"""
+        while len(trail) > mark:
+            group, domain = trail.pop()
+            domains[group] = domain
+
+    def greedy_schedule(self, assignments: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """
+        Place assignments one at a time in a random valid slot, without backtracking
+        Groups with the fewest valid slots go first. Returns the assignments left unplaced.
+        """
+        counts: Dict[Tuple[str, str], int] = {}
+        for assignment in assignments:
+            counts[assignment] = counts.get(assignment, 0) + 1
+        
+        order = sorted(counts, key=lambda group: self.get_available_slot_mask(group[0], group[1]).bit_count() - counts[group])
+        unplaced = []
+        
+        for group in order:
+            for _ in range(counts[group]):
+                positions = mask_positions(self.get_available_slot_mask(group[0], group[1]))
+                if not positions:
+                    unplaced.append(group)
+                    continue
+                
+                hint = self.hint_starts.get(group, 0)
+                hinted = [position for position in positions if hint >> position & 1]
+                self.add_entries(self.place_session(group[0], group[1], self.rng.choice(hinted or positions)))
+        
+        return unplaced
+
+    def repair_schedule(self, unplaced: List[Tuple[str, str]], deadline: Optional[float] = None,
+                        max_rounds: int = 10, round_time_limit: float = 1.0) -> bool:
+        """
+        Large-neighbourhood repair of a partial timetable
+        The first round only fits the unplaced assignments around the pinned timetable.
+        Each later round also unassigns a growing random share of the entries around
+        them (same batches, instructors of the same subjects) and a smaller share of
+        the rest, and re-solves them together for at most round_time_limit seconds while
+        every other entry stays pinned. A failed round is rolled back. The last round
+        frees the whole timetable and runs until the deadline.
+        """
+        round_number = 0
+        
+        while unplaced:
+            if round_number >= max_rounds or self.search_expired(deadline):
+                return False
+            round_number += 1
+            
+            neighbourhood = []
+            if round_number > 1:
+                batch_ids = {batch_id for batch_id, _ in unplaced}
+                faculty_ids = {f.id for _, subject_id in unplaced for f in self.qualified_faculty.get(subject_id, [])}
+                share = (round_number - 1) / max(max_rounds - 1, 1)
+                # Whole sessions only; pieces of broken multi-slot sessions stay pinned
+                neighbourhood = [
+                    session for session in self.split_sessions(self.timetable)
+                    if len(session) == self.session_length(session[0].subject_id) and self.rng.random() < (
+                        share if session[0].batch_id in batch_ids or session[0].faculty_id in faculty_ids
+                        else share * share
+                    )
+                ]
+            
+            freed = [entry for session in neighbourhood for entry in session]
+            self.remove_entries(freed)
+            mark = len(self.timetable)
+            
+            subset = unplaced + [(session[0].batch_id, session[0].subject_id) for session in neighbourhood]
+            round_deadline = deadline
+            if round_number < max_rounds:
+                round_deadline = time.monotonic() + round_time_limit
+                if deadline is not None:
+                    round_deadline = min(round_deadline, deadline)
+            
+            if self.backtrack_schedule(subset, deadline=round_deadline):
+                unplaced = []
+                continue
+            
+            # Roll back the round; pinned classes may have been re-roomed meanwhile.
+            # Multi-slot sessions go back first, as they only fit their own rooms.
+            while len(self.timetable) > mark:
+                self.remove_entry(self.timetable[-1])
+            for session in sorted(neighbourhood, key=len, reverse=True):
+                for entry in self.restore_session(session):
+                    unplaced.append((entry.batch_id, entry.subject_id))
+        
+        return True
+
+    def get_available_slot_mask(self, batch_id: str, subject_id: str) -> int:
+        """
+        Bitmask of slot positions where the batch, a qualified faculty member
+        within workload limits and a suitable classroom are all free
+        For multi-slot subjects, the start positions of blocks where they are free throughout.
+        """
+        length = self.session_length(subject_id)
+        if length > 1:
+            return self.get_available_block_mask(batch_id, subject_id, length)
+        
+        mask = self.teaching_slot_mask & ~self.occupancy.batch_mask(batch_id)
+        for rule in self.search_rules:
+            mask &= ~rule.blocked_slots(self.occupancy, batch_id, subject_id)
+        if not mask:
+            return 0
+        
+        faculty_mask = 0
+        for faculty_member in self.qualified_faculty.get(subject_id, []):
+            faculty_mask |= self.get_faculty_free_mask(faculty_member)
+        mask &= faculty_mask
+        if not mask:
+            return 0
+        
+        classroom_mask = 0
+        suitable_classrooms = self.get_suitable_classrooms(batch_id, subject_id)
+        for classroom in suitable_classrooms:
+            classroom_mask |= ~self.occupancy.classroom_mask(classroom.id)
+            if mask & classroom_mask == mask:
+                return mask
         
-        # Get possible time slots for this assignment
-        possible_slots = self.get_valid_time_slots(batch_id, subject_id)
+        # Where every suitable room is taken, the classes already there may still be re-roomed
+        if suitable_classrooms:
+            for position in mask_positions(mask & ~classroom_mask):
+                if self.find_classroom_rearrangement(batch_id, subject_id, position):
+                    classroom_mask |= 1 << position
         
-        # Shuffle for randomization
-        random.shuffle(possible_slots)
+        return mask & classroom_mask
+
+    def get_available_block_mask(self, batch_id: str, subject_id: str, length: int) -> int:
+        """Bitmask of start positions of slot blocks where one multi-slot session of the group fits"""
+        busy = self.occupancy.batch_mask(batch_id)
+        mask = 0
         
-        for time_slot in possible_slots:
-            # Try to assign this time slot
-            entry = self.try_assign_slot(batch_id, subject_id, time_slot)
-            
-            if entry:
-                self.timetable.append(entry)
-                
-                # Recursively try to schedule remaining assignments
-                if self.backtrack_schedule(assignments, index + 1):
-                    return True
-                
-                # Backtrack - remove this assignment
-                self.timetable.remove(entry)
+        for start, cover in self.block_covers.get(length, {}).items():
+            if (
+                not cover & busy
+                and self.find_session_faculty(subject_id, start, length)
+                and self.find_session_classroom(batch_id, subject_id, cover)
+                and not any(rule.blocks_session(self.occupancy, batch_id, subject_id, cover) for rule in self.search_rules)
+            ):
+                mask |= 1 << start
         
-        return False  # No valid assignment found
+        return mask
+
+    def get_faculty_free_mask(self, faculty_member: Faculty) -> int:
+        """Bitmask of teaching slots a faculty member can still take"""
+        return self.teaching_slot_mask & ~self.occupancy.faculty_blocked_mask(faculty_member.id)
 
     def get_valid_time_slots(self, batch_id: str, subject_id: str) -> List[TimeSlot]:
         """Get all valid time slots for a batch-subject combination"""
-        valid_slots = []
-        
-        for slot in self.time_slots:
-            if slot.is_break:
-                continue
-                
-            if self.is_slot_valid(batch_id, subject_id, slot):
-                valid_slots.append(slot)
-        
-        return valid_slots
+        mask = self.get_available_slot_mask(batch_id, subject_id)
+        return [self.time_slots[position] for position in mask_positions(mask)]
 
     def is_slot_valid(self, batch_id: str, subject_id: str, slot: TimeSlot) -> bool:
         """Check if a time slot is valid for assignment"""
         # Check if batch is already scheduled at this time
-        for entry in self.timetable:
-            if entry.batch_id == batch_id and entry.time_slot_id == slot.id:
-                return False
-        
-        return True
+        return not self.occupancy.is_batch_busy(batch_id, slot.id)
 
     def try_assign_slot(self, batch_id: str, subject_id: str, slot: TimeSlot) -> Optional[TimetableEntry]:
         """Try to assign a specific time slot"""
@@ -240,11 +2616,14 @@ class TimetableGenerator:
         # Find suitable classroom
         classroom = self.find_available_classroom(batch_id, subject_id, slot)
         if not classroom:
-            return None
-        
-        # Check faculty workload constraints
-        if not self.check_faculty_workload(faculty_member.id, slot):
-            return None
+            # Free a suitable room by moving classes at this slot to other rooms
+            rearrangement = self.find_classroom_rearrangement(batch_id, subject_id, self.slot_positions[slot.id])
+            if not rearrangement:
+                return None
+            
+            classroom, moves = rearrangement
+            for moved_entry, new_classroom in moves:
+                self.reassign_classroom(moved_entry, new_classroom)
         
         return TimetableEntry(
             time_slot_id=slot.id,
@@ -255,34 +2634,236 @@ class TimetableGenerator:
             class_type="lecture"
         )
 
-    def find_available_faculty(self, subject_id: str, slot: TimeSlot) -> Optional[Faculty]:
-        """Find available faculty for subject at given time slot"""
-        # Get faculty who can teach this subject
-        qualified_faculty = [
-            f for f in self.faculty 
-            if subject_id in f.subjects
-        ]
+    def place_session(self, batch_id: str, subject_id: str, position: int) -> Optional[List[TimetableEntry]]:
+        """
+        Entries of one session of the group starting at a slot position, or None if it does not fit
+        Multi-slot sessions keep one faculty member and one classroom for every slot they cover.
+        """
+        hinted = self.place_hinted_session(batch_id, subject_id, position)
+        if hinted:
+            return hinted
         
-        # Check availability
-        for faculty_member in qualified_faculty:
-            # Check if faculty is already assigned at this time
-            is_busy = any(
-                entry.faculty_id == faculty_member.id and entry.time_slot_id == slot.id
-                for entry in self.timetable
+        length = self.session_length(subject_id)
+        if length == 1:
+            entry = self.try_assign_slot(batch_id, subject_id, self.time_slots[position])
+            return [entry] if entry else None
+        
+        cover = self.block_covers.get(length, {}).get(position)
+        if cover is None or cover & self.occupancy.batch_mask(batch_id):
+            return None
+        # Faculty are checked first: the room search is wasted on a block nobody can teach
+        faculty_member = self.find_session_faculty(subject_id, position, length)
+        if not faculty_member:
+            return None
+        classroom = self.find_session_classroom(batch_id, subject_id, cover)
+        if not classroom:
+            return None
+        
+        return self.session_entries(batch_id, subject_id, cover, faculty_member.id, classroom.id)
+
+    def place_hinted_session(self, batch_id: str, subject_id: str, position: int) -> Optional[List[TimetableEntry]]:
+        """The warm-start session of the group at a start position, if its faculty member and classroom are still free"""
+        hint = self.hint_resources.get((batch_id, subject_id, position))
+        if not hint:
+            return None
+        
+        length = self.session_length(subject_id)
+        cover = 1 << position if length == 1 else self.block_covers.get(length, {}).get(position)
+        faculty_member = self.faculty_by_id.get(hint[0])
+        classroom = self.classrooms_by_id.get(hint[1])
+        if cover is None or not faculty_member or not classroom or cover & self.occupancy.batch_mask(batch_id):
+            return None
+        
+        day = self.slot_days[self.time_slots[position].id]
+        if (
+            all(f.id != faculty_member.id for f in self.qualified_faculty.get(subject_id, []))
+            or all(c.id != classroom.id for c in self.get_suitable_classrooms(batch_id, subject_id))
+            or self.occupancy.faculty_blocked_mask(faculty_member.id) & cover
+            or self.occupancy.classroom_mask(classroom.id) & cover
+            or self.occupancy.faculty_day_count(faculty_member.id, day) + length > faculty_member.max_classes_per_day
+            or self.occupancy.faculty_week_count(faculty_member.id) + length > faculty_member.max_classes_per_week
+        ):
+            return None
+        
+        self.metrics.warm_start_placements += 1
+        return self.session_entries(batch_id, subject_id, cover, faculty_member.id, classroom.id)
+
+    def session_entries(self, batch_id: str, subject_id: str, cover: int, faculty_id: str,
+                        classroom_id: str) -> List[TimetableEntry]:
+        """Entries of one session over the slots of a cover mask"""
+        subject = self.subjects_by_id.get(subject_id)
+        multi_slot = self.session_length(subject_id) > 1
+        return [
+            TimetableEntry(
+                time_slot_id=self.time_slots[covered].id,
+                subject_id=subject_id,
+                faculty_id=faculty_id,
+                classroom_id=classroom_id,
+                batch_id=batch_id,
+                class_type="practical" if multi_slot and subject and subject.requires_lab else "lecture"
             )
-            
-            if not is_busy:
-                return faculty_member
+            for covered in mask_positions(cover)
+        ]
+
+    def find_session_faculty(self, subject_id: str, start: int, length: int) -> Optional[Faculty]:
+        """
+        Least-loaded qualified faculty member free for a whole block, with workload left for all of it
+        Like find_available_faculty, the member with the most weekly, then daily, slack takes it.
+        """
+        cover = self.block_covers[length][start]
+        day = self.time_slots[start].day_of_week
+        best, best_slack = None, None
+        
+        for faculty_member in self.qualified_faculty.get(subject_id, []):
+            slack = self.occupancy.faculty_slack(faculty_member.id, day)
+            if (
+                min(slack) >= length
+                and (best_slack is None or slack > best_slack)
+                and not self.occupancy.faculty_blocked_mask(faculty_member.id) & cover
+            ):
+                best, best_slack = faculty_member, slack
+        
+        return best
+
+    def find_session_classroom(self, batch_id: str, subject_id: str, cover: int) -> Optional[Classroom]:
+        """Suitable classroom free in every slot of a block"""
+        for classroom in self.get_suitable_classrooms(batch_id, subject_id):
+            if not self.occupancy.classroom_mask(classroom.id) & cover:
+                return classroom
         
         return None
 
+    @timed
+    def find_available_faculty(self, subject_id: str, slot: TimeSlot) -> Optional[Faculty]:
+        """
+        Find available faculty for subject at given time slot
+        Takes the least-loaded member: most weekly, then daily, workload left, catalog order
+        on ties. Filling the first qualified member up to their limits would leave later
+        classes of the subject with fewer staffed slots and push the search into backtracking.
+        """
+        slot_bit = 1 << self.slot_positions[slot.id]
+        best, best_slack = None, None
+        
+        # Blocked slots cover both existing assignments and reached workload limits
+        for faculty_member in self.qualified_faculty.get(subject_id, []):
+            if not self.occupancy.faculty_blocked_mask(faculty_member.id) & slot_bit:
+                slack = self.occupancy.faculty_slack(faculty_member.id, slot.day_of_week)
+                if best_slack is None or slack > best_slack:
+                    best, best_slack = faculty_member, slack
+        
+        return best
+
+    @timed
     def find_available_classroom(self, batch_id: str, subject_id: str, slot: TimeSlot) -> Optional[Classroom]:
         """Find available classroom for batch at given time slot"""
-        batch = next((b for b in self.batches if b.id == batch_id), None)
-        subject = next((s for s in self.subjects if s.id == subject_id), None)
+        # Check availability
+        for classroom in self.get_suitable_classrooms(batch_id, subject_id):
+            if not self.occupancy.is_classroom_busy(classroom.id, slot.id):
+                return classroom
+        
+        return None
+
+    def find_classroom_rearrangement(self, batch_id: str, subject_id: str, position: int
+                                     ) -> Optional[Tuple[Classroom, List[Tuple[TimetableEntry, Classroom]]]]:
+        """
+        Augmenting path in the slot's class-to-room bipartite matching
+        Breadth-first search from the rooms suitable for the new class, through the classes
+        holding them, to a free room. Returns the room for the new class and the (entry,
+        new room) moves to apply, shortest chain first, or None if no matching exists.
+        """
+        parents: Dict[str, Optional[Classroom]] = {}
+        frontier = deque()
+        for classroom in self.get_suitable_classrooms(batch_id, subject_id):
+            parents[classroom.id] = None
+            frontier.append(classroom)
+        
+        while frontier:
+            classroom = frontier.popleft()
+            holder = self.occupancy.classroom_holder(classroom.id, position)
+            
+            if holder is None and self.occupancy.classroom_mask(classroom.id) >> position & 1:
+                continue  # Unavailable at this slot, nothing to move
+            if holder is not None and self.session_length(holder.subject_id) > 1:
+                continue  # Multi-slot sessions keep their room throughout
+            
+            if holder is None:
+                # Walk back: each parent room's holder moves one step down the chain
+                moves = []
+                while parents[classroom.id] is not None:
+                    parent = parents[classroom.id]
+                    moves.append((self.occupancy.classroom_holder(parent.id, position), classroom))
+                    classroom = parent
+                return classroom, moves
+            
+            for next_classroom in self.get_suitable_classrooms(holder.batch_id, holder.subject_id):
+                if next_classroom.id not in parents:
+                    parents[next_classroom.id] = classroom
+                    frontier.append(next_classroom)
+        
+        return None
+
+    def restore_session(self, session: List[TimetableEntry]) -> List[TimetableEntry]:
+        """
+        Re-add a previously placed session, returning the entries that could not be restored
+        A multi-slot session takes back its own room in every slot it covers: single classes
+        re-roomed into it meanwhile are moved out again, so the session is never split.
+        """
+        if len(session) == 1:
+            return [] if self.restore_entry(session[0]) else session
+        
+        evicted = []
+        for entry in session:
+            holder = self.occupancy.classroom_holder(entry.classroom_id, self.slot_positions[entry.time_slot_id])
+            if holder is not None:
+                # Only single classes are ever re-roomed, so the holder is one
+                self.remove_entry(holder)
+                evicted.append(holder)
+        self.add_entries(session)
+        return [holder for holder in evicted if not self.restore_entry(holder)]
+
+    def restore_entry(self, entry: TimetableEntry) -> bool:
+        """
+        Re-add a previously placed single-slot entry, re-rooming it (and its slot) if its room was taken
+        Returns False, leaving the entry out, if no rooming of the slot fits it.
+        """
+        position = self.slot_positions[entry.time_slot_id]
+        if self.occupancy.classroom_mask(entry.classroom_id) >> position & 1:
+            classroom = self.find_available_classroom(entry.batch_id, entry.subject_id, self.time_slots[position])
+            if not classroom:
+                rearrangement = self.find_classroom_rearrangement(entry.batch_id, entry.subject_id, position)
+                if not rearrangement:
+                    return False
+                classroom, moves = rearrangement
+                for moved_entry, new_classroom in moves:
+                    self.reassign_classroom(moved_entry, new_classroom)
+            entry.classroom_id = classroom.id
+        
+        self.add_entry(entry)
+        return True
+
+    def reassign_classroom(self, entry: TimetableEntry, classroom: Classroom):
+        """Move a placed entry to another classroom in the same slot (in place)"""
+        self.occupancy.unassign(entry)
+        entry.classroom_id = classroom.id
+        self.occupancy.assign(entry)
+        self.fitness_state = None
+
+    def get_suitable_classrooms(self, batch_id: str, subject_id: str) -> List[Classroom]:
+        """Get classrooms that fit a batch and suit the subject"""
+        suitable_classrooms = self.suitable_classrooms.get((batch_id, subject_id))
+        if suitable_classrooms is None:
+            suitable_classrooms = self.suitable_classrooms[(batch_id, subject_id)] = (
+                self.find_suitable_classrooms(batch_id, subject_id)
+            )
+        return suitable_classrooms
+
+    def find_suitable_classrooms(self, batch_id: str, subject_id: str) -> List[Classroom]:
+        """Classrooms that fit a batch and suit the subject, tightest capacity fit first"""
+        batch = self.batches_by_id.get(batch_id)
+        subject = self.subjects_by_id.get(subject_id)
         
         if not batch or not subject:
-            return None
+            return []
         
         # Filter classrooms by capacity and type
         suitable_classrooms = [
@@ -296,53 +2877,48 @@ class TimetableGenerator:
             if lab_classrooms:
                 suitable_classrooms = lab_classrooms
         
-        # Check availability
-        for classroom in suitable_classrooms:
-            is_occupied = any(
-                entry.classroom_id == classroom.id and entry.time_slot_id == slot.id
-                for entry in self.timetable
-            )
-            
-            if not is_occupied:
-                return classroom
-        
-        return None
+        return sorted(suitable_classrooms, key=lambda c: c.capacity)
 
+    @timed
     def check_faculty_workload(self, faculty_id: str, slot: TimeSlot) -> bool:
         """Check if faculty workload constraints are satisfied"""
-        faculty_member = next((f for f in self.faculty if f.id == faculty_id), None)
+        faculty_member = self.faculty_by_id.get(faculty_id)
         if not faculty_member:
             return False
         
         # Count classes for this faculty on the same day
-        same_day_classes = sum(
-            1 for entry in self.timetable
-            if entry.faculty_id == faculty_id and 
-            any(ts.day_of_week == slot.day_of_week and ts.id == entry.time_slot_id 
-                for ts in self.time_slots)
-        )
+        same_day_classes = self.occupancy.faculty_day_count(faculty_id, slot.day_of_week)
         
         if same_day_classes >= faculty_member.max_classes_per_day:
             return False
         
         # Count total weekly classes
-        total_weekly_classes = sum(
-            1 for entry in self.timetable
-            if entry.faculty_id == faculty_id
-        )
+        total_weekly_classes = self.occupancy.faculty_week_count(faculty_id)
         
         if total_weekly_classes >= faculty_member.max_classes_per_week:
             return False
         
         return True
 
-    def calculate_fitness(self) -> float:
-        """Calculate fitness score of the current timetable"""
+    def get_scorer(self) -> TimetableScorer:
+        """Get the scorer for the current catalog, building it on first use"""
+        if self.scorer is None:
+            self.scorer = TimetableScorer(self.time_slots, self.classrooms, self.subjects, self.faculty, self.batches)
+        return self.scorer
+
+    def encode_timetable(self, entries: Optional[List[TimetableEntry]] = None) -> EncodedTimetable:
+        """Encode a timetable (the current one by default) as integer arrays"""
+        return self.get_scorer().encode(self.timetable if entries is None else entries)
+
+    @timed
+    def calculate_fitness(self, entries: Optional[List[TimetableEntry]] = None) -> float:
+        """Calculate fitness score of a timetable (the current one by default)"""
+        encoded = self.encode_timetable(entries)
         total_score = 0.0
         max_possible_score = 0.0
         
         for constraint in self.constraints:
-            score = self.evaluate_constraint(constraint)
+            score = self.evaluate_constraint(constraint, encoded)
             weighted_score = score * constraint.weight
             total_score += weighted_score
             max_possible_score += constraint.weight
@@ -350,209 +2926,657 @@ class TimetableGenerator:
         # Return normalized fitness score (0-1)
         return total_score / max_possible_score if max_possible_score > 0 else 0.0
 
-    def evaluate_constraint(self, constraint: Constraint) -> float:
+    def get_constraint_rules(self) -> Dict[str, ConstraintRule]:
+        """Compile the loaded constraints against the current catalog, once per catalog"""
+        if self.constraint_rules is None:
+            scorer = self.get_scorer()
+            self.constraint_rules = {}
+            for constraint in self.constraints:
+                if constraint.name not in CONSTRAINT_RULES and constraint.name not in self.reported_constraints:
+                    print(f"[v0] No rule registered for constraint '{constraint.name}', counting it as satisfied")
+                    self.reported_constraints.add(constraint.name)
+                self.constraint_rules[constraint.name] = compile_constraint(scorer, constraint)
+            self.search_rules = [rule for rule in self.constraint_rules.values() if rule.is_hard and rule.prunes_search]
+        return self.constraint_rules
+
+    def get_constraint_rule(self, constraint: Constraint) -> ConstraintRule:
+        """Compiled rule of a constraint; constraints that are not loaded are compiled on the fly"""
+        rule = self.get_constraint_rules().get(constraint.name)
+        if rule is None or rule.constraint is not constraint:
+            rule = compile_constraint(self.get_scorer(), constraint)
+        return rule
+
+    def evaluate_constraint(self, constraint: Constraint, encoded: Optional[EncodedTimetable] = None) -> float:
         """Evaluate a specific constraint (returns 0-1)"""
-        if constraint.name == "No Faculty Double Booking":
-            return self.check_no_faculty_double_booking()
-        elif constraint.name == "No Classroom Double Booking":
-            return self.check_no_classroom_double_booking()
-        elif constraint.name == "No Batch Double Booking":
-            return self.check_no_batch_double_booking()
-        elif constraint.name == "Faculty Workload Limit":
-            return self.check_faculty_workload_limits()
-        elif constraint.name == "Classroom Capacity":
-            return self.check_classroom_capacity()
-        elif constraint.name == "Subject-Faculty Matching":
-            return self.check_subject_faculty_matching()
-        elif constraint.name == "Consecutive Classes Preference":
-            return self.check_consecutive_classes()
-        elif constraint.name == "Balanced Daily Schedule":
-            return self.check_balanced_schedule()
-        else:
-            return 1.0  # Unknown constraint, assume satisfied
+        rule = self.get_constraint_rule(constraint)
+        if encoded is None:
+            encoded = self.encode_timetable()
+        
+        if not self.collect_timings:
+            return rule.score(encoded)
+        started = time.perf_counter()
+        score = rule.score(encoded)
+        self.metrics.add_time(self.metrics.constraint_timings, constraint.name, time.perf_counter() - started)
+        return score
 
-    def check_no_faculty_double_booking(self) -> float:
-        """Check that no faculty is double-booked"""
-        violations = 0
-        total_checks = 0
+    def get_fitness_state(self) -> FitnessState:
+        """Get the incremental constraint aggregates of the current timetable"""
+        if self.fitness_state is None:
+            self.fitness_state = FitnessState(
+                self.get_scorer(), self.encode_timetable(), list(self.get_constraint_rules().values())
+            )
+        return self.fitness_state
+
+    def constraint_scores(self) -> Dict[str, float]:
+        """Score of every loaded constraint for the current timetable"""
+        state = self.get_fitness_state()
+        return {c.name: state.constraint_score(c) for c in self.constraints}
+
+    def evaluate_move(self, index: int, time_slot_id: str, faculty_id: Optional[str] = None,
+                      classroom_id: Optional[str] = None) -> Dict[str, float]:
+        """
+        Per-constraint score change if timetable[index] moved to another slot
+        Faculty and classroom are kept unless given. The timetable is not modified.
+        """
+        state = self.get_fitness_state()
+        before = self.constraint_scores()
+        previous = state.move(index, *self.encode_move(index, time_slot_id, faculty_id, classroom_id))
+        after = self.constraint_scores()
+        state.move(index, *previous)
+        return {name: after[name] - before[name] for name in before}
+
+    def evaluate_swap(self, first: int, second: int) -> Dict[str, float]:
+        """Per-constraint score change if two entries exchanged time slots (timetable is not modified)"""
+        state = self.get_fitness_state()
+        before = self.constraint_scores()
+        state.swap_slots(first, second)
+        after = self.constraint_scores()
+        state.swap_slots(first, second)
+        return {name: after[name] - before[name] for name in before}
+
+    def fitness_delta(self, score_deltas: Dict[str, float]) -> float:
+        """Change of the normalized fitness score for per-constraint score deltas"""
+        max_possible_score = sum(c.weight for c in self.constraints)
+        if max_possible_score <= 0:
+            return 0.0
+        return sum(score_deltas.get(c.name, 0.0) * c.weight for c in self.constraints) / max_possible_score
+
+    def apply_move(self, index: int, time_slot_id: str, faculty_id: Optional[str] = None,
+                   classroom_id: Optional[str] = None):
+        """Move timetable[index] to another slot, keeping the index and aggregates in sync"""
+        state = self.get_fitness_state()
+        old_entry = self.timetable[index]
+        new_entry = replace(
+            old_entry,
+            time_slot_id=time_slot_id,
+            faculty_id=faculty_id or old_entry.faculty_id,
+            classroom_id=classroom_id or old_entry.classroom_id,
+        )
+        state.move(index, *self.encode_move(index, time_slot_id, faculty_id, classroom_id))
         
-        for slot in self.time_slots:
-            if slot.is_break:
-                continue
-                
-            faculty_at_slot = [
-                entry.faculty_id for entry in self.timetable
-                if entry.time_slot_id == slot.id
-            ]
-            
-            total_checks += len(faculty_at_slot)
-            violations += len(faculty_at_slot) - len(set(faculty_at_slot))
+        self.occupancy.unassign(old_entry)
+        self.occupancy.assign(new_entry)
+        self.timetable[index] = new_entry
+
+    def apply_swap(self, first: int, second: int):
+        """Exchange the time slots of two entries, keeping the index and aggregates in sync"""
+        state = self.get_fitness_state()
+        old_first, old_second = self.timetable[first], self.timetable[second]
+        new_first = replace(old_first, time_slot_id=old_second.time_slot_id)
+        new_second = replace(old_second, time_slot_id=old_first.time_slot_id)
+        state.swap_slots(first, second)
         
-        return 1.0 - (violations / max(total_checks, 1))
+        self.occupancy.unassign(old_first)
+        self.occupancy.unassign(old_second)
+        self.occupancy.assign(new_first)
+        self.occupancy.assign(new_second)
+        self.timetable[first], self.timetable[second] = new_first, new_second
 
-    def check_no_classroom_double_booking(self) -> float:
-        """Check that no classroom is double-booked"""
-        violations = 0
-        total_checks = 0
+    def encode_move(self, index: int, time_slot_id: str, faculty_id: Optional[str],
+                    classroom_id: Optional[str]) -> Tuple[int, int, int]:
+        """Scorer codes of the (slot, faculty, room) an entry would move to"""
+        scorer = self.get_scorer()
+        entry = self.timetable[index]
+        return (
+            scorer.intern(scorer.slot_codes, time_slot_id),
+            scorer.intern(scorer.faculty_codes, faculty_id or entry.faculty_id),
+            scorer.intern(scorer.room_codes, classroom_id or entry.classroom_id),
+        )
+
+    def optimize_timetable(self, config: Optional[OptimizerConfig] = None,
+                           on_improvement: Optional[Callable[[List[TimetableEntry], float], None]] = None
+                           ) -> Tuple[List[TimetableEntry], float]:
+        """
+        Improve the current (complete) timetable by local search
+        Simulated annealing over slot moves and same-batch slot swaps, with a tabu
+        list of recently changed entries. Only moves that keep every hard constraint
+        satisfied are considered; entries of multi-slot sessions stay where construction
+        put them. The best timetable found so far is always available in
+        self.best_solution and is reported through on_improvement.
+        Returns: (timetable_entries, fitness_score)
+        """
+        config = config or OptimizerConfig()
+        deadline = time.monotonic() + config.time_budget
         
-        for slot in self.time_slots:
-            if slot.is_break:
-                continue
-                
-            classrooms_at_slot = [
-                entry.classroom_id for entry in self.timetable
-                if entry.time_slot_id == slot.id
-            ]
-            
-            total_checks += len(classrooms_at_slot)
-            violations += len(classrooms_at_slot) - len(set(classrooms_at_slot))
+        current_fitness = self.calculate_fitness()
+        best_fitness = current_fitness
+        self.best_solution = (list(self.timetable), best_fitness)
         
-        return 1.0 - (violations / max(total_checks, 1))
-
-    def check_no_batch_double_booking(self) -> float:
-        """Check that no batch is double-booked"""
-        violations = 0
-        total_checks = 0
+        batch_entries: Dict[str, List[int]] = {}
+        for index, entry in enumerate(self.timetable):
+            batch_entries.setdefault(entry.batch_id, []).append(index)
         
-        for slot in self.time_slots:
-            if slot.is_break:
+        temperature = config.initial_temperature
+        tabu: deque = deque(maxlen=max(config.tabu_tenure, 0))
+        iteration = 0
+        
+        while (self.timetable and self.constraints and iteration < config.max_iterations
+               and not self.search_expired(deadline)):
+            iteration += 1
+            self.metrics.optimizer_iterations += 1
+            temperature = max(temperature * config.cooling_rate, config.min_temperature)
+            index = self.rng.randrange(len(self.timetable))
+            
+            if self.rng.random() < config.swap_probability:
+                partner = self.propose_swap(index, batch_entries[self.timetable[index].batch_id])
+                if partner is None:
+                    continue
+                touched = (index, partner)
+                delta = self.fitness_delta(self.evaluate_swap(index, partner))
+            else:
+                move = self.propose_move(index)
+                if move is None:
+                    continue
+                touched = (index,)
+                delta = self.fitness_delta(self.evaluate_move(index, *move))
+            
+            # Tabu entries may only change when that yields a new best (aspiration)
+            if any(i in tabu for i in touched) and current_fitness + delta <= best_fitness:
                 continue
-                
-            batches_at_slot = [
-                entry.batch_id for entry in self.timetable
-                if entry.time_slot_id == slot.id
-            ]
             
-            total_checks += len(batches_at_slot)
-            violations += len(batches_at_slot) - len(set(batches_at_slot))
+            if delta < 0 and self.rng.random() >= math.exp(delta / temperature):
+                continue
+            
+            if len(touched) == 2:
+                self.apply_swap(*touched)
+            else:
+                self.apply_move(index, *move)
+            current_fitness += delta
+            tabu.extend(touched)
+            
+            if current_fitness > best_fitness + 1e-12:
+                best_fitness = current_fitness
+                self.best_solution = (list(self.timetable), best_fitness)
+                if on_improvement:
+                    on_improvement(self.best_solution[0], best_fitness)
+                if self.on_progress:
+                    self.report_progress("optimize", best_fitness)
         
-        return 1.0 - (violations / max(total_checks, 1))
+        # Recompute exactly, so the result does not carry accumulated rounding
+        best_entries = self.best_solution[0]
+        self.reset_timetable(best_entries)
+        self.best_solution = (best_entries, self.calculate_fitness())
+        print(f"[v0] Local search finished after {iteration} iterations, fitness: {self.best_solution[1]}")
+        return self.best_solution
 
-    def check_faculty_workload_limits(self) -> float:
-        """Check faculty workload constraints"""
-        violations = 0
-        total_faculty = len(self.faculty)
+    def propose_move(self, index: int) -> Optional[Tuple[str, str, str]]:
+        """Pick a random feasible (slot, faculty, classroom) for timetable[index] other than its current slot"""
+        entry = self.timetable[index]
+        if self.session_length(entry.subject_id) > 1:
+            return None  # Multi-slot sessions are only placed as a whole, during construction
+        self.occupancy.unassign(entry)
         
-        for faculty_member in self.faculty:
-            # Check daily limits
-            for day in range(1, 6):  # Monday to Friday
-                daily_classes = sum(
-                    1 for entry in self.timetable
-                    if entry.faculty_id == faculty_member.id and
-                    any(ts.day_of_week == day and ts.id == entry.time_slot_id 
-                        for ts in self.time_slots)
-                )
-                
-                if daily_classes > faculty_member.max_classes_per_day:
-                    violations += 1
+        try:
+            mask = self.get_available_slot_mask(entry.batch_id, entry.subject_id)
+            mask &= ~(1 << self.slot_positions[entry.time_slot_id])
+            if not mask:
+                return None
             
-            # Check weekly limits
-            weekly_classes = sum(
-                1 for entry in self.timetable
-                if entry.faculty_id == faculty_member.id
-            )
+            slot = self.time_slots[self.rng.choice(mask_positions(mask))]
             
-            if weekly_classes > faculty_member.max_classes_per_week:
-                violations += 1
+            # Keep the current faculty member and classroom when they are free
+            if self.is_entry_placeable(replace(entry, time_slot_id=slot.id)):
+                return slot.id, entry.faculty_id, entry.classroom_id
+            
+            faculty_id = entry.faculty_id
+            if self.occupancy.faculty_blocked_mask(faculty_id) >> self.slot_positions[slot.id] & 1:
+                faculty_id = self.find_available_faculty(entry.subject_id, slot).id
+            
+            classroom_id = entry.classroom_id
+            if self.occupancy.is_classroom_busy(classroom_id, slot.id):
+                # Slots reachable only by re-rooming other classes are left to construction
+                classroom = self.find_available_classroom(entry.batch_id, entry.subject_id, slot)
+                if not classroom:
+                    return None
+                classroom_id = classroom.id
+            
+            return slot.id, faculty_id, classroom_id
+        finally:
+            self.occupancy.assign(entry)
+
+    def propose_swap(self, index: int, candidates: List[int]) -> Optional[int]:
+        """Pick an entry of the same batch whose slot can be exchanged with timetable[index]"""
+        first = self.timetable[index]
+        partner = self.rng.choice(candidates)
+        second = self.timetable[partner]
         
-        return 1.0 - (violations / max(total_faculty * 6, 1))  # 5 days + 1 weekly check
+        if first.time_slot_id == second.time_slot_id or first.subject_id == second.subject_id:
+            return None
+        if self.session_length(first.subject_id) > 1 or self.session_length(second.subject_id) > 1:
+            return None
+        
+        new_first = replace(first, time_slot_id=second.time_slot_id)
+        new_second = replace(second, time_slot_id=first.time_slot_id)
+        
+        self.occupancy.unassign(first)
+        self.occupancy.unassign(second)
+        feasible = self.is_entry_placeable(new_first)
+        if feasible:
+            self.occupancy.assign(new_first)
+            feasible = self.is_entry_placeable(new_second)
+            self.occupancy.unassign(new_first)
+        self.occupancy.assign(first)
+        self.occupancy.assign(second)
+        
+        return partner if feasible else None
 
-    def check_classroom_capacity(self) -> float:
-        """Check classroom capacity constraints"""
-        violations = 0
-        total_entries = len(self.timetable)
+    def split_sessions(self, entries: List[TimetableEntry]) -> List[List[TimetableEntry]]:
+        """
+        Group timetable entries into sessions
+        Entries of single-slot subjects are sessions of their own. Entries of a multi-slot
+        subject with the same batch, faculty member and classroom are cut into blocks of
+        the session length; entries that do not form a whole block come out one by one.
+        """
+        sessions: List[List[TimetableEntry]] = []
+        blocks: Dict[Tuple[str, str, str, str], List[TimetableEntry]] = {}
+        for entry in entries:
+            if self.session_length(entry.subject_id) == 1 or entry.time_slot_id not in self.slot_positions:
+                sessions.append([entry])
+            else:
+                blocks.setdefault((entry.batch_id, entry.subject_id, entry.faculty_id, entry.classroom_id), []).append(entry)
         
-        for entry in self.timetable:
-            batch = next((b for b in self.batches if b.id == entry.batch_id), None)
-            classroom = next((c for c in self.classrooms if c.id == entry.classroom_id), None)
-            
-            if batch and classroom and batch.student_count > classroom.capacity:
-                violations += 1
+        for (_, subject_id, _, _), block_entries in blocks.items():
+            length = self.session_length(subject_id)
+            covers = self.block_covers.get(length, {})
+            block_entries.sort(key=lambda e: (self.slot_days[e.time_slot_id], self.slots_by_id[e.time_slot_id].slot_number))
+            index = 0
+            while index < len(block_entries):
+                candidate = block_entries[index:index + length]
+                cover = sum(1 << self.slot_positions[e.time_slot_id] for e in candidate)
+                if covers.get(self.slot_positions[candidate[0].time_slot_id]) == cover and len(candidate) == length:
+                    sessions.append(candidate)
+                    index += length
+                else:
+                    sessions.append([block_entries[index]])
+                    index += 1
         
-        return 1.0 - (violations / max(total_entries, 1))
+        return sessions
 
-    def check_subject_faculty_matching(self) -> float:
-        """Check that faculty are qualified for assigned subjects"""
-        violations = 0
-        total_entries = len(self.timetable)
+    def is_session_placeable(self, session: List[TimetableEntry]) -> bool:
+        """Check that a whole session can be added without breaking a hard constraint"""
+        if len(session) == 1:
+            return self.is_entry_placeable(session[0])
         
-        for entry in self.timetable:
-            faculty_member = next((f for f in self.faculty if f.id == entry.faculty_id), None)
-            
-            if faculty_member and entry.subject_id not in faculty_member.subjects:
-                violations += 1
+        entry = session[0]
+        cover = sum(1 << self.slot_positions[e.time_slot_id] for e in session)
+        day = self.slot_days[entry.time_slot_id]
+        max_per_day, max_per_week = self.faculty_limits.get(entry.faculty_id, (0, 0))
+        occupancy = self.occupancy
+        return (
+            occupancy.faculty_day_count(entry.faculty_id, day) + len(session) <= max_per_day
+            and occupancy.faculty_week_count(entry.faculty_id) + len(session) <= max_per_week
+            and not (occupancy.batch_mask(entry.batch_id) | occupancy.faculty_blocked_mask(entry.faculty_id)
+                     | occupancy.classroom_mask(entry.classroom_id)) & cover
+            and not any(rule.blocks_session(occupancy, entry.batch_id, entry.subject_id, cover) for rule in self.search_rules)
+        )
+
+    def is_entry_placeable(self, entry: TimetableEntry) -> bool:
+        """Check that an entry can be added without breaking a hard constraint"""
+        position = self.slot_positions.get(entry.time_slot_id)
+        if position is None or not self.teaching_slot_mask >> position & 1:
+            return False
         
-        return 1.0 - (violations / max(total_entries, 1))
+        occupancy = self.occupancy
+        blocked = (occupancy.batch_mask(entry.batch_id) | occupancy.faculty_blocked_mask(entry.faculty_id)
+                   | occupancy.classroom_mask(entry.classroom_id))
+        for rule in self.search_rules:
+            blocked |= rule.blocked_slots(occupancy, entry.batch_id, entry.subject_id)
+        return not blocked >> position & 1
+
+    def check_no_faculty_double_booking(self) -> float:
+        """Check that no faculty is double-booked"""
+        return self.get_scorer().no_faculty_double_booking(self.encode_timetable())
+
+    def check_no_classroom_double_booking(self) -> float:
+        """Check that no classroom is double-booked"""
+        return self.get_scorer().no_classroom_double_booking(self.encode_timetable())
+
+    def check_no_batch_double_booking(self) -> float:
+        """Check that no batch is double-booked"""
+        return self.get_scorer().no_batch_double_booking(self.encode_timetable())
+
+    def check_faculty_workload_limits(self) -> float:
+        """Check faculty workload constraints"""
+        return self.get_scorer().faculty_workload_limits(self.encode_timetable())
+
+    def check_classroom_capacity(self) -> float:
+        """Check classroom capacity constraints"""
+        return self.get_scorer().classroom_capacity(self.encode_timetable())
+
+    def check_subject_faculty_matching(self) -> float:
+        """Check that faculty are qualified for assigned subjects"""
+        return self.get_scorer().subject_faculty_matching(self.encode_timetable())
 
     def check_consecutive_classes(self) -> float:
         """Soft constraint: prefer consecutive classes for same subject"""
-        consecutive_bonus = 0
-        total_possible = 0
-        
-        # Group entries by batch and day
-        for batch in self.batches:
-            for day in range(1, 6):  # Monday to Friday
-                day_entries = [
-                    entry for entry in self.timetable
-                    if entry.batch_id == batch.id and
-                    any(ts.day_of_week == day and ts.id == entry.time_slot_id 
-                        for ts in self.time_slots)
-                ]
-                
-                # Sort by slot number
-                day_entries.sort(key=lambda e: next(
-                    ts.slot_number for ts in self.time_slots 
-                    if ts.id == e.time_slot_id
-                ))
-                
-                # Check for consecutive classes of same subject
-                for i in range(len(day_entries) - 1):
-                    total_possible += 1
-                    if day_entries[i].subject_id == day_entries[i + 1].subject_id:
-                        consecutive_bonus += 1
-        
-        return consecutive_bonus / max(total_possible, 1)
+        return self.get_scorer().consecutive_classes(self.encode_timetable())
 
     def check_balanced_schedule(self) -> float:
         """Soft constraint: balanced distribution across days"""
-        balance_score = 0
+        return self.get_scorer().balanced_schedule(self.encode_timetable())
+
+    def generate_multiple_options(self, department_id: Optional[str] = None, num_options: int = 3,
+                                  optimizer_config: Optional[OptimizerConfig] = None,
+                                  max_workers: Optional[int] = None,
+                                  time_limit: Optional[float] = None,
+                                  warm_start: Optional[List[TimetableEntry]] = None, backend: str = "search",
+                                  mp_context=None) -> List[Tuple[List[TimetableEntry], float]]:
+        """
+        Generate multiple timetable options in parallel
+        Each option runs in a worker process on a shared immutable snapshot with its own
+        seeded random generator; this generator's own data is left untouched. Options use
+        this generator's solution cache, if any. max_workers=1 generates the options in
+        this process; mp_context is the multiprocessing context of the worker pool (e.g.
+        spawn, when other threads are running).
+        """
+        snapshot = self.create_snapshot(department_id)
+        # Use different random seeds for variety
+        seeds = [42 + i for i in range(num_options)]
+        workers = min(max_workers or os.cpu_count() or 1, num_options)
+        settings = (optimizer_config, time_limit, warm_start, backend, self.solution_cache)
         
-        for batch in self.batches:
-            daily_counts = [0] * 5  # Monday to Friday
-            
-            for entry in self.timetable:
-                if entry.batch_id == batch.id:
-                    slot = next((ts for ts in self.time_slots if ts.id == entry.time_slot_id), None)
-                    if slot and 1 <= slot.day_of_week <= 5:
-                        daily_counts[slot.day_of_week - 1] += 1
+        if workers <= 1:
+            options = [generate_option(snapshot, seed, *settings) for seed in seeds]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=init_option_worker,
+                                     initargs=(snapshot,)) as pool:
+                packed = list(pool.map(generate_worker_option, seeds, *(itertools.repeat(value) for value in settings)))
+            scorer = TimetableScorer.for_snapshot(snapshot)
+            options = [(scorer.decode(encoded), fitness) for encoded, fitness in packed]
+        
+        # Sort by fitness score (best first)
+        options.sort(key=lambda x: x[1], reverse=True)
+        return options
+
+    def solve_portfolio(self, department_id: Optional[str] = None,
+                        strategies: Tuple[str, ...] = SEARCH_STRATEGIES,
+                        seeds_per_strategy: int = 1, time_limit: float = 30.0,
+                        target_fitness: Optional[float] = None,
+                        optimizer_config: Optional[OptimizerConfig] = None,
+                        max_workers: Optional[int] = None, mp_context=None) -> PortfolioResult:
+        """
+        Race several strategies and seeds against one global deadline
+        As soon as a complete timetable reaches target_fitness it wins and the remaining
+        runs are terminated; otherwise the best result at the deadline is returned. Runs
+        queued behind busy workers get the time left when they start, and none after the
+        deadline. mp_context is the multiprocessing context of the worker pool (default:
+        spawn, as forking can copy locks held by other threads).
+        """
+        snapshot = self.create_snapshot(department_id)
+        runs = [(strategy, 42 + i) for strategy in strategies for i in range(seeds_per_strategy)]
+        started = time.monotonic()
+        deadline = started + time_limit
+        finished: queue.Queue = queue.Queue()
+        results: List[Dict] = []
+        winner: Optional[Dict] = None
+        
+        workers = min(max_workers or os.cpu_count() or 1, len(runs))
+        context = mp_context or multiprocessing.get_context("spawn")
+        with context.Pool(workers, initializer=init_option_worker, initargs=(snapshot,)) as pool:
+            for strategy, seed in runs:
+                pool.apply_async(
+                    run_portfolio_member, (strategy, seed, optimizer_config, deadline),
+                    callback=finished.put,
+                    error_callback=lambda error, strategy=strategy, seed=seed: finished.put({
+                        "strategy": strategy,
+                        "seed": seed,
+                        "fitness": 0.0,
+                        "complete": False,
+                        "elapsed": time.monotonic() - started,
+                        "error": f"{type(error).__name__}: {error}",
+                    }),
+                )
             
-            # Calculate variance (lower is better)
-            if sum(daily_counts) > 0:
-                mean_classes = sum(daily_counts) / 5
-                variance = sum((count - mean_classes) ** 2 for count in daily_counts) / 5
-                # Convert to score (0-1, higher is better)
-                balance_score += 1.0 / (1.0 + variance)
+            # Runs stop themselves at the deadline; allow a moment to collect their results
+            received = 0
+            while received < len(runs):
+                try:
+                    result = finished.get(timeout=max(deadline + 1.0 - time.monotonic(), 0.0))
+                except queue.Empty:
+                    break
+                received += 1
+                if result is None:
+                    continue  # started after the deadline, counted as cancelled
+                results.append(result)
+                if "error" in result:
+                    print(f"[v0] Portfolio run {result['strategy']}/{result['seed']} failed: {result['error']}")
+                    continue
+                print(f"[v0] Portfolio run {result['strategy']}/{result['seed']} finished: fitness {result['fitness']}")
+                if result["complete"] and (winner is None or result["fitness"] > winner["fitness"]):
+                    winner = result
+                if winner and target_fitness is not None and winner["fitness"] >= target_fitness:
+                    break
+            # Leaving the pool context terminates any runs still in progress
+        
+        if winner is None:
+            # No complete timetable: fall back to the largest partial one
+            partial = [r for r in results if "entries" in r]
+            winner = max(partial, key=lambda r: len(r["entries"]), default=None)
         
-        return balance_score / max(len(self.batches), 1)
+        return PortfolioResult(
+            entries=TimetableScorer.for_snapshot(snapshot).decode(winner["entries"]) if winner else [],
+            fitness=winner["fitness"] if winner else 0.0,
+            strategy=winner["strategy"] if winner else None,
+            seed=winner["seed"] if winner else None,
+            complete=bool(winner and winner["complete"]),
+            elapsed=time.monotonic() - started,
+            runs=[
+                {key: r[key] for key in ("strategy", "seed", "fitness", "complete", "elapsed", "error") if key in r}
+                for r in results
+            ],
+            metrics=winner["metrics"] if winner else None,
+            cancelled_runs=len(runs) - len(results),
+        )
 
-    def generate_multiple_options(self, department_id: Optional[str] = None, num_options: int = 3) -> List[Tuple[List[TimetableEntry], float]]:
-        """Generate multiple timetable options"""
-        options = []
+    def generate_campus_timetables(self, department_ids: Optional[List[str]] = None,
+                                   time_limit: Optional[float] = None, max_workers: Optional[int] = None,
+                                   max_negotiation_rounds: int = 5, exclusive_rooms: bool = True) -> CampusResult:
+        """
+        Generate conflict-free timetables for several departments at once
+        Each classroom-slot is reserved for one department: with exclusive_rooms, rooms
+        owned by a department with classes to schedule start out reserved to it, and all
+        other rooms are interleaved across departments in proportion to demand (without
+        exclusive_rooms every room is interleaved). Departments are solved in parallel on
+        their reservations only. After each round, successful departments release the
+        reservations they did not use, those are handed to the departments that failed,
+        and only those are re-solved.
+        """
+        if department_ids is None:
+            department_ids = sorted({b.department_id for b in self.batches})
+        
+        snapshots = {d: self.create_snapshot(d) for d in department_ids}
+        # Room-slots each department occupies: every session takes its length in slots
+        demand = {}
+        for department_id, snapshot in snapshots.items():
+            subjects = {s.id: s for s in snapshot.subjects}
+            demand[department_id] = sum(
+                subjects[subject_id].classes_per_week * self.session_length(subject_id)
+                for batch in snapshot.batches for subject_id in batch.subjects if subject_id in subjects
+            )
+        
+        # Initial reservations: (classroom_id, slot_id) -> department. Departments with nothing
+        # to schedule are never solved, so they could not release rooms reserved to them.
+        owners = {d for d in department_ids if demand[d] > 0} if exclusive_rooms else set()
+        teaching_slots = [slot for slot in self.time_slots if not slot.is_break]
+        reservations: Dict[Tuple[str, str], str] = {}
+        shared_room_slots = []
+        for slot in teaching_slots:
+            for classroom in sorted(self.classrooms, key=lambda c: c.capacity):
+                if classroom.department_id in owners:
+                    reservations[(classroom.id, slot.id)] = classroom.department_id
+                else:
+                    shared_room_slots.append((classroom.id, slot.id))
+        self.distribute_room_slots(shared_room_slots, list(department_ids), demand, reservations)
         
-        for i in range(num_options):
-            print(f"[v0] Generating timetable option {i + 1}/{num_options}")
-            # Use different random seeds for variety
-            random.seed(42 + i)
+        timetables: Dict[str, List[TimetableEntry]] = {}
+        fitness: Dict[str, float] = {}
+        metrics: Dict[str, SolverMetrics] = {}
+        pending = [d for d in department_ids if demand[d] > 0]
+        for department_id in department_ids:
+            if demand[department_id] == 0:
+                timetables[department_id], fitness[department_id] = [], 0.0
+        rounds = 0
+        
+        while pending and rounds < max_negotiation_rounds:
+            rounds += 1
+            print(f"[v0] Campus negotiation round {rounds}: solving {len(pending)} departments")
+            
+            unavailable = {d: self.unavailable_room_slots(reservations, d) for d in pending}
+            tasks = [(snapshots[d], unavailable[d], 42 + rounds, time_limit) for d in pending]
+            workers = min(max_workers or os.cpu_count() or 1, len(tasks))
+            if workers <= 1:
+                results = [solve_department(*task) for task in tasks]
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    results = list(pool.map(solve_department, *zip(*tasks)))
             
-            timetable, fitness = self.generate_timetable(department_id)
-            options.append((timetable.copy(), fitness))
+            failed = []
+            for department_id, (entries, score, complete, run_metrics) in zip(pending, results):
+                timetables[department_id], fitness[department_id] = entries, score
+                metrics[department_id] = run_metrics
+                if not complete:
+                    failed.append(department_id)
+                    continue
+                
+                # Keep only the room-slots actually used
+                used = {(e.classroom_id, e.time_slot_id) for e in entries}
+                for key, owner in list(reservations.items()):
+                    if owner == department_id and key not in used:
+                        del reservations[key]
             
-            # Reset for next iteration
-            self.timetable = []
+            pending = failed
+            released = [
+                (classroom.id, slot.id) for slot in teaching_slots for classroom in sorted(self.classrooms, key=lambda c: c.capacity)
+                if (classroom.id, slot.id) not in reservations
+            ]
+            if not pending or not released:
+                break
+            self.distribute_room_slots(released, pending, demand, reservations)
         
-        # Sort by fitness score (best first)
-        options.sort(key=lambda x: x[1], reverse=True)
-        return options
+        if pending:
+            print(f"[v0] Campus solve left {len(pending)} departments incomplete")
+        
+        return CampusResult(
+            timetables=timetables,
+            fitness=fitness,
+            failed_departments=pending,
+            negotiation_rounds=rounds,
+            metrics=metrics,
+        )
+
+    @staticmethod
+    def distribute_room_slots(room_slots: List[Tuple[str, str]], department_ids: List[str],
+                              demand: Dict[str, int], reservations: Dict[Tuple[str, str], str]):
+        """Reserve room-slots to departments round-robin, weighted by class demand"""
+        allocated = {d: 0 for d in department_ids}
+        for owner in reservations.values():
+            if owner in allocated:
+                allocated[owner] += 1
+        
+        candidates = [d for d in department_ids if demand.get(d, 0) > 0]
+        if not candidates:
+            return
+        
+        for room_slot in room_slots:
+            department_id = min(candidates, key=lambda d: allocated[d] / demand[d])
+            reservations[room_slot] = department_id
+            allocated[department_id] += 1
+
+    def unavailable_room_slots(self, reservations: Dict[Tuple[str, str], str], department_id: str) -> Dict[str, Set[str]]:
+        """Room-slots a department may not use: everything not reserved to it"""
+        unavailable: Dict[str, Set[str]] = {}
+        for slot in self.time_slots:
+            for classroom in self.classrooms:
+                if reservations.get((classroom.id, slot.id)) != department_id:
+                    unavailable.setdefault(classroom.id, set()).add(slot.id)
+        return unavailable
+
+def generate_option(snapshot: ProblemSnapshot, seed: int, optimizer_config: Optional[OptimizerConfig] = None,
+                    time_limit: Optional[float] = None, warm_start: Optional[List[TimetableEntry]] = None,
+                    backend: str = "search", solution_cache: Optional[SolutionCache] = None
+                    ) -> Tuple[List[TimetableEntry], float]:
+    """Generate one timetable option from a snapshot with its own random seed"""
+    print(f"[v0] Generating timetable option with seed {seed}")
+    generator = TimetableGenerator(seed)
+    generator.load_snapshot(snapshot)
+    generator.solution_cache = solution_cache
+    return generator.generate_timetable(
+        optimizer_config=optimizer_config, time_limit=time_limit, warm_start=warm_start, backend=backend
+    )
+
+# Problem snapshot of the current option worker process, set once by the pool initializer
+_worker_snapshot: Optional[ProblemSnapshot] = None
+
+def init_option_worker(snapshot: ProblemSnapshot):
+    """Pool initializer of option and portfolio workers"""
+    global _worker_snapshot
+    _worker_snapshot = snapshot
+    # Keep stdout free for whoever owns it (e.g. the JSON-lines solver service); workers
+    # return their results through the pool, so logs go to stderr
+    sys.stdout = sys.stderr
+
+def generate_worker_option(seed: int, optimizer_config: Optional[OptimizerConfig], time_limit: Optional[float],
+                           warm_start: Optional[List[TimetableEntry]], backend: str,
+                           solution_cache: Optional[SolutionCache]) -> Tuple[EncodedTimetable, float]:
+    """Generate one option in a worker; the timetable travels back as integer columns"""
+    entries, fitness = generate_option(
+        _worker_snapshot, seed, optimizer_config, time_limit, warm_start, backend, solution_cache
+    )
+    return TimetableScorer.for_snapshot(_worker_snapshot).encode(entries), fitness
+
+def solve_department(snapshot: ProblemSnapshot, unavailable_room_slots: Dict[str, Set[str]], seed: int,
+                     time_limit: Optional[float]) -> Tuple[List[TimetableEntry], float, bool, SolverMetrics]:
+    """Solve one department of a campus solve on its reserved room-slots"""
+    generator = TimetableGenerator(seed)
+    generator.classroom_unavailability = unavailable_room_slots
+    generator.load_snapshot(snapshot)
+    entries, fitness = generator.generate_timetable(time_limit=time_limit)
+    return entries, fitness, len(entries) == generator.count_required_entries(), generator.metrics
+
+def run_portfolio_member(strategy: str, seed: int, optimizer_config: Optional[OptimizerConfig],
+                         deadline: float) -> Optional[Dict]:
+    """
+    Run one portfolio strategy/seed in a worker process; entries come back encoded
+    deadline is the portfolio's time.monotonic() deadline: the run gets the time left when
+    it starts, and returns None without solving when there is none.
+    """
+    started = time.monotonic()
+    if started >= deadline:
+        return None
+    generator = TimetableGenerator(seed)
+    generator.load_snapshot(_worker_snapshot)
+    entries, fitness = generator.generate_timetable(
+        optimizer_config=optimizer_config, time_limit=deadline - started, strategy=strategy
+    )
+    return {
+        "strategy": strategy,
+        "seed": seed,
+        "entries": generator.encode_timetable(entries),
+        "fitness": fitness,
+        "complete": len(entries) == generator.count_required_entries(),
+        "elapsed": time.monotonic() - started,
+        "metrics": generator.metrics,
+    }
 
 def main():
     """Test the timetable generator"""
@@ -0,0 +1,267 @@
+"""
+Timetable Job Queue
+Runs timetable generation as background jobs on a bounded pool of worker
+processes, with progress events, cancellation and per-job deadlines
+"""
+
+import itertools
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Callable, Dict, Iterator, List, Optional
+
+from timetable_generator import OptimizerConfig, ProblemSnapshot, SolverMetrics, TimetableEntry, TimetableGenerator
+
+class JobStatus(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+FINISHED_STATUSES = (JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+@dataclass
+class Job:
+    """One timetable generation job and everything reported about it so far"""
+    id: str
+    snapshot: ProblemSnapshot
+    strategy: str = "mrv"
+    backend: str = "search"
+    seed: Optional[int] = None
+    time_limit: Optional[float] = None  # seconds of solving, counted from when the job starts
+    optimizer_config: Optional[OptimizerConfig] = None
+    collect_timings: bool = False
+    profile: bool = False
+    status: JobStatus = JobStatus.QUEUED
+    events: List[Dict] = field(default_factory=list)
+    entries: List[TimetableEntry] = field(default_factory=list)
+    fitness: float = 0.0
+    complete: bool = False
+    metrics: Optional[SolverMetrics] = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+class JobQueue:
+    """
+    Bounded pool of solver processes fed from a FIFO job queue
+    Workers report progress through one shared event queue that a manager thread
+    drains; on_event(job_id, event) is called from that thread for every event.
+    A cancelled or overdue job is first asked to stop (keeping its partial
+    timetable) and terminated if it does not stop within cancel_grace seconds.
+    """
+
+    def __init__(self, max_workers: int = 2, on_event: Optional[Callable[[str, Dict], None]] = None,
+                 cancel_grace: float = 2.0):
+        self.max_workers = max(max_workers, 1)
+        self.on_event = on_event
+        self.cancel_grace = cancel_grace
+        self.jobs: Dict[str, Job] = {}
+        self.pending: List[str] = []
+        self.running: Dict[str, tuple] = {}  # job_id -> (process, cancel event, stop-by time)
+        self.job_ids = itertools.count(1)
+        # Spawn, not fork: forking from the manager thread would copy locks held by
+        # other threads (e.g. a blocked stdin read) into the worker
+        self.context = multiprocessing.get_context("spawn")
+        self.worker_events = self.context.Queue()
+        self.changed = threading.Condition()
+        self.closed = False
+        self.manager = threading.Thread(target=self.manage, name="timetable-jobs", daemon=True)
+        self.manager.start()
+
+    def submit(self, snapshot: ProblemSnapshot, strategy: str = "mrv", seed: Optional[int] = None,
+               time_limit: Optional[float] = None, optimizer_config: Optional[OptimizerConfig] = None,
+               collect_timings: bool = False, profile: bool = False, backend: str = "search") -> str:
+        """Queue a generation job and return its id"""
+        if strategy not in TimetableGenerator.SEARCH_STRATEGIES:
+            raise ValueError(f"Unknown search strategy: {strategy}")
+        if backend not in TimetableGenerator.SOLVER_BACKENDS:
+            raise ValueError(f"Unknown solver backend: {backend}")
+
+        with self.changed:
+            if self.closed:
+                raise RuntimeError("Job queue is shut down")
+            job = Job(
+                f"job-{next(self.job_ids)}", snapshot, strategy, backend, seed, time_limit, optimizer_config,
+                collect_timings, profile
+            )
+            self.jobs[job.id] = job
+            self.pending.append(job.id)
+            self.record(job, {"type": "status", "status": job.status.value})
+            self.changed.notify_all()
+        return job.id
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; False if it had already finished"""
+        with self.changed:
+            job = self.jobs[job_id]
+            if job.status in FINISHED_STATUSES:
+                return False
+            job.cancel_requested = True
+
+            if job.status == JobStatus.QUEUED:
+                self.pending.remove(job_id)
+                self.finish(job, JobStatus.CANCELLED)
+            else:
+                process, cancel_event, _ = self.running[job_id]
+                cancel_event.set()
+                # The worker stops at its next check and returns its partial timetable
+                self.running[job_id] = (process, cancel_event, time.monotonic() + self.cancel_grace)
+            self.changed.notify_all()
+            return True
+
+    def get(self, job_id: str) -> Job:
+        return self.jobs[job_id]
+
+    def events(self, job_id: str, since: int = 0) -> List[Dict]:
+        """Events of a job from index since on"""
+        with self.changed:
+            return list(self.jobs[job_id].events[since:])
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Job:
+        """Block until the job has finished or the timeout passes"""
+        with self.changed:
+            self.changed.wait_for(lambda: self.jobs[job_id].finished_at is not None, timeout)
+            return self.jobs[job_id]
+
+    def stream(self, job_id: str) -> Iterator[Dict]:
+        """Yield the events of a job as they arrive, until it has finished"""
+        index = 0
+        while True:
+            with self.changed:
+                job = self.jobs[job_id]
+                self.changed.wait_for(lambda: len(job.events) > index or job.finished_at is not None)
+                events = job.events[index:]
+                finished = job.finished_at is not None
+            yield from events
+            index += len(events)
+            if finished and index >= len(job.events):
+                return
+
+    def shutdown(self):
+        """Cancel every unfinished job and stop the manager thread"""
+        with self.changed:
+            self.closed = True
+            for job_id in list(self.pending) + list(self.running):
+                self.cancel(job_id)
+            self.changed.notify_all()
+        self.manager.join()
+
+    def manage(self):
+        """Manager thread: start queued jobs, collect worker events, enforce deadlines"""
+        while True:
+            try:
+                job_id, event = self.worker_events.get(timeout=0.1)
+            except queue.Empty:
+                job_id, event = None, None
+
+            with self.changed:
+                if event is not None and job_id in self.running:
+                    self.handle_worker_event(self.jobs[job_id], event)
+                self.check_running_jobs()
+                self.start_pending_jobs()
+                self.changed.notify_all()
+                if self.closed and not self.running:
+                    return
+
+    def handle_worker_event(self, job: Job, event: Dict):
+        if event["type"] == "progress":
+            self.record(job, event)
+        elif event["type"] == "result":
+            job.entries, job.fitness, job.complete = event["entries"], event["fitness"], event["complete"]
+            job.metrics = event["metrics"]
+            self.finish(job, JobStatus.COMPLETED)
+        elif event["type"] == "error":
+            job.error = event["error"]
+            self.finish(job, JobStatus.FAILED)
+
+    def check_running_jobs(self):
+        """Reap finished workers and terminate ones past their stop-by time"""
+        now = time.monotonic()
+        for job_id, (process, _, stop_by) in list(self.running.items()):
+            job = self.jobs[job_id]
+            if job.finished_at is not None:
+                process.join()
+                del self.running[job_id]
+            elif not process.is_alive() and self.worker_events.empty():
+                # Worker died without reporting a result
+                job.error = job.error or f"Worker exited with code {process.exitcode}"
+                self.finish(job, JobStatus.FAILED)
+                del self.running[job_id]
+            elif stop_by is not None and now > stop_by:
+                process.terminate()
+                process.join()
+                job.error = job.error or "Worker did not stop in time and was terminated"
+                self.finish(job, JobStatus.FAILED)
+                del self.running[job_id]
+
+    def start_pending_jobs(self):
+        while self.pending and len(self.running) < self.max_workers and not self.closed:
+            job = self.jobs[self.pending.pop(0)]
+            cancel_event = self.context.Event()
+            process = self.context.Process(
+                target=run_job,
+                args=(job.id, job.snapshot, job.strategy, job.backend, job.seed, job.time_limit, job.optimizer_config,
+                      job.collect_timings, job.profile, self.worker_events, cancel_event),
+                daemon=True,
+            )
+            process.start()
+            # Past its own deadline a job gets cancel_grace seconds to return its partial timetable
+            stop_by = time.monotonic() + job.time_limit + self.cancel_grace if job.time_limit is not None else None
+            self.running[job.id] = (process, cancel_event, stop_by)
+            job.status = JobStatus.RUNNING
+            job.started_at = time.time()
+            self.record(job, {"type": "status", "status": job.status.value})
+
+    def finish(self, job: Job, status: JobStatus):
+        # A cancelled job counts as cancelled however its worker ended
+        job.status = JobStatus.CANCELLED if job.cancel_requested else status
+        job.finished_at = time.time()
+        self.record(job, {
+            "type": "status",
+            "status": job.status.value,
+            "fitness": job.fitness,
+            "complete": job.complete,
+            "error": job.error,
+        })
+
+    def record(self, job: Job, event: Dict):
+        event = dict(event, time=time.time())
+        job.events.append(event)
+        if self.on_event:
+            self.on_event(job.id, event)
+
+def run_job(job_id: str, snapshot: ProblemSnapshot, strategy: str, backend: str, seed: Optional[int],
+            time_limit: Optional[float], optimizer_config: Optional[OptimizerConfig],
+            collect_timings: bool, profile: bool, events: multiprocessing.Queue, cancel_event) -> None:
+    """Worker process body: solve one job, streaming progress and the result to the event queue"""
+    # Keep stdout free for whoever owns it (e.g. the JSON-lines solver service)
+    sys.stdout = sys.stderr
+
+    generator = TimetableGenerator(seed)
+    generator.load_snapshot(snapshot)
+    generator.collect_timings, generator.profile = collect_timings, profile
+    required = generator.count_required_entries()
+    generator.on_progress = lambda progress: events.put((job_id, dict(progress, type="progress", required=required)))
+    generator.stop_requested = cancel_event.is_set
+    try:
+        entries, fitness = generator.generate_timetable(
+            optimizer_config=optimizer_config, time_limit=time_limit, strategy=strategy,
+            backend=backend
+        )
+        events.put((job_id, {
+            "type": "result",
+            "entries": entries,
+            "fitness": fitness,
+            "complete": len(entries) == required,
+            "metrics": generator.metrics,
+        }))
+    except Exception as error:
+        events.put((job_id, {"type": "error", "error": f"{type(error).__name__}: {error}"}))
@@ -0,0 +1,399 @@
+"""
+Timetable Solver Service
+Long-running worker that answers JSON-lines requests on stdin/stdout and keeps
+loaded problem instances warm between requests
+"""
+
+import contextlib
+import hashlib
+import itertools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, Optional, TextIO
+
+from timetable_generator import (
+    ENTRY_COLUMNS, ChangeSet, EncodedTimetable, OptimizerConfig, ProblemCatalog, ProblemSnapshot, SolutionCache,
+    TimetableEntry, TimetableGenerator
+)
+from timetable_jobs import JobQueue
+
+@dataclass
+class StoredOption:
+    """Generated timetable option kept packed until its entries are exported"""
+    id: str
+    encoded: EncodedTimetable  # encoded with the scorer of the problem's warm generator
+    fitness: float
+
+@dataclass
+class CachedProblem:
+    """Loaded, department-filtered and indexed problem instance"""
+    key: str
+    snapshot: ProblemSnapshot  # the department's view of the shared catalog
+    generator: TimetableGenerator  # warm generator reused by sequential generate requests
+    loaded_at: float
+    options: "OrderedDict[str, StoredOption]" = field(default_factory=OrderedDict)  # oldest first
+
+class ProblemCache:
+    """
+    LRU cache of loaded problems keyed by department, semester and content hash
+    Problems with the same data share one catalog, so loading another department
+    neither re-parses the data nor duplicates the shared time slots and classrooms.
+    """
+
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self.problems: "OrderedDict[str, CachedProblem]" = OrderedDict()
+        self.catalogs: Dict[str, ProblemCatalog] = {}  # content hash -> catalog of the cached problems
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(data: Dict, department_id: Optional[str], semester: Optional[int]) -> str:
+        """department:semester:sha256 of the canonical JSON of the problem data"""
+        canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+        content_hash = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+        return f"{department_id or '*'}:{semester if semester is not None else '*'}:{content_hash}"
+
+    @staticmethod
+    def content_hash(key: str) -> str:
+        return key.rsplit(":", 1)[-1]
+
+    def get(self, key: str) -> Optional[CachedProblem]:
+        problem = self.problems.get(key)
+        if problem is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.problems.move_to_end(key)
+        return problem
+
+    def load(self, key: str, data: Dict, department_id: Optional[str]) -> CachedProblem:
+        """Index a problem once, evicting the least recently used one when full"""
+        content_hash = self.content_hash(key)
+        catalog = self.catalogs.get(content_hash)
+        if catalog is None:
+            catalog = self.catalogs[content_hash] = ProblemCatalog(data)
+        generator = TimetableGenerator()
+        generator.load_catalog(catalog, department_id)
+        problem = CachedProblem(key, catalog.view(department_id), generator, time.time())
+
+        self.problems[key] = problem
+        self.problems.move_to_end(key)
+        while len(self.problems) > self.max_entries:
+            self.problems.popitem(last=False)
+        self.drop_unused_catalogs()
+        return problem
+
+    def evict(self, key: Optional[str] = None) -> int:
+        """Drop one problem, or all of them when no key is given"""
+        if key is None:
+            count = len(self.problems)
+            self.problems.clear()
+            self.catalogs.clear()
+            return count
+        evicted = 1 if self.problems.pop(key, None) is not None else 0
+        self.drop_unused_catalogs()
+        return evicted
+
+    def drop_unused_catalogs(self):
+        in_use = {self.content_hash(key) for key in self.problems}
+        for content_hash in [h for h in self.catalogs if h not in in_use]:
+            del self.catalogs[content_hash]
+
+class SolverService:
+    """Dispatches JSON-lines requests to the timetable generator"""
+
+    def __init__(self, cache_size: int = 16, max_jobs: int = 2, max_options: int = 12,
+                 solution_cache: Optional[SolutionCache] = None, default_time_limit: float = 30.0):
+        self.cache = ProblemCache(cache_size)
+        # Complete timetables kept across restarts; generate skips problems solved before
+        self.solutions = solution_cache
+        self.max_options = max_options  # generated options kept per cached problem for export
+        # Seconds per solve when a request gives no time_limit: requests are answered one at a
+        # time, so an unbounded search (e.g. on an infeasible problem) would block every later one
+        self.default_time_limit = default_time_limit
+        self.option_ids = itertools.count(1)
+        # Called with unsolicited messages (job events) for the client
+        self.notify: Optional[Callable[[Dict], None]] = None
+        self.jobs = JobQueue(max_jobs, on_event=self.publish_job_event)
+        self.methods = {
+            "ping": self.ping,
+            "load": self.load,
+            "generate": self.generate,
+            "export": self.export,
+            "repair": self.repair,
+            "analyze": self.analyze,
+            "submit": self.submit,
+            "job": self.job,
+            "cancel": self.cancel,
+            "stats": self.stats,
+            "evict": self.evict,
+        }
+
+    def handle(self, request: Dict) -> Dict:
+        """Run one request; errors are reported in the response instead of stopping the service"""
+        request_id = request.get("id")
+        method = self.methods.get(request.get("method"))
+        if method is None:
+            return {"id": request_id, "error": f"Unknown method: {request.get('method')}"}
+        try:
+            return {"id": request_id, "result": method(request.get("params") or {})}
+        except Exception as error:
+            return {"id": request_id, "error": f"{type(error).__name__}: {error}"}
+
+    def resolve_problem(self, params: Dict) -> CachedProblem:
+        """Cached problem for a request, given either its problem_key or the full data"""
+        department_id = params.get("department_id")
+        if "data" in params:
+            key = self.cache.make_key(params["data"], department_id, params.get("semester"))
+        else:
+            key = params.get("problem_key")
+            if not key:
+                raise ValueError("Request needs either data or problem_key")
+
+        problem = self.cache.get(key)
+        if problem is None:
+            if "data" not in params:
+                raise KeyError(f"Problem {key} is not cached; resend the data")
+            print(f"[v0] Loading problem {key}")
+            problem = self.cache.load(key, params["data"], department_id)
+        return problem
+
+    def ping(self, params: Dict) -> Dict:
+        return {"ok": True}
+
+    def load(self, params: Dict) -> Dict:
+        problem = self.resolve_problem(params)
+        return {"problem_key": problem.key, "required_assignments": len(problem.generator.get_required_assignments())}
+
+    def generate(self, params: Dict) -> Dict:
+        """
+        Generate timetable options for a cached problem
+        Options are kept packed on the problem and returned as summaries with their ids;
+        their entries are fetched with export. warm_start entries (e.g. last semester's
+        timetable) are tried first by the search.
+        """
+        problem = self.resolve_problem(params)
+        num_options = params.get("num_options", 3)
+        time_limit = params.get("time_limit", self.default_time_limit)  # per option
+        max_workers = params.get("max_workers", 1)
+        optimizer_config = OptimizerConfig(**params["optimizer"]) if params.get("optimizer") else None
+        warm_start = [TimetableEntry(**entry) for entry in params.get("warm_start", [])]
+        generator = problem.generator
+        required = generator.count_required_entries()
+        generator.reset_timetable()
+        report = generator.check_feasibility()
+
+        if max_workers == 1:
+            # Reuse the warm generator: its lookup tables are already built
+            generator.collect_timings = params.get("collect_timings", False)
+            generator.profile = params.get("profile", False)
+            generator.solution_cache = self.solutions
+            options = []
+            for seed in [42 + i for i in range(num_options)]:
+                generator.reseed(seed)
+                entries, fitness = generator.generate_timetable(
+                    optimizer_config=optimizer_config, time_limit=time_limit, warm_start=warm_start,
+                    backend=params.get("backend", "search")
+                )
+                options.append((generator.encode_timetable(entries), fitness, asdict(generator.metrics)))
+            options.sort(key=lambda x: x[1], reverse=True)
+        else:
+            # Worker processes do not report metrics back
+            if params.get("collect_timings") or params.get("profile"):
+                raise ValueError("collect_timings and profile need max_workers=1")
+            generator.solution_cache = self.solutions
+            options = [
+                (generator.encode_timetable(entries), fitness, None)
+                for entries, fitness in generator.generate_multiple_options(
+                    num_options=num_options, optimizer_config=optimizer_config,
+                    max_workers=max_workers, time_limit=time_limit, warm_start=warm_start,
+                    backend=params.get("backend", "search"),
+                    # Spawn, like the job queue: its manager thread makes forking unsafe
+                    mp_context=self.jobs.context
+                )
+            ]
+
+        suggestions = [issue.description for issue in report.issues]
+        summaries = []
+        for number, (encoded, fitness, metrics) in enumerate(options, start=1):
+            option = self.store_option(problem, encoded, fitness)
+            summaries.append({
+                "option_id": option.id,
+                "option_number": number,
+                "fitness_score": fitness,
+                "entry_count": len(encoded),
+                "conflicts": required - len(encoded),  # class slots that could not be placed
+                "suggestions": suggestions,
+                "metrics": metrics,
+            })
+
+        return {"problem_key": problem.key, "feasibility": asdict(report), "options": summaries}
+
+    def store_option(self, problem: CachedProblem, encoded: EncodedTimetable, fitness: float) -> StoredOption:
+        """Keep an option for export, dropping the problem's oldest options past max_options"""
+        option = StoredOption(f"option-{next(self.option_ids)}", encoded, fitness)
+        problem.options[option.id] = option
+        while len(problem.options) > self.max_options:
+            problem.options.popitem(last=False)
+        return option
+
+    def export(self, params: Dict) -> Dict:
+        """
+        One chunk of a generated option's entries, as value rows in column order
+        Clients page through an option by sending next_offset back as offset until it is
+        null, writing each chunk before asking for the next one.
+        """
+        problem = self.resolve_problem(params)
+        option = problem.options.get(params["option_id"])
+        if option is None:
+            raise KeyError(f"Option {params['option_id']} is not stored; generate it again")
+
+        offset = params.get("offset", 0)
+        limit = params.get("limit", 500)
+        scorer = problem.generator.get_scorer()
+        rows = next(scorer.iter_entry_rows(option.encoded, limit, offset), [])
+        next_offset = offset + len(rows)
+        return {
+            "option_id": option.id,
+            "columns": list(ENTRY_COLUMNS),
+            "rows": rows,
+            "total": len(option.encoded),
+            "next_offset": next_offset if next_offset < len(option.encoded) else None,
+        }
+
+    def analyze(self, params: Dict) -> Dict:
+        """Pre-solve feasibility report of a cached problem, without solving it"""
+        problem = self.resolve_problem(params)
+        problem.generator.reset_timetable()
+        return {"problem_key": problem.key, "feasibility": asdict(problem.generator.check_feasibility())}
+
+    def repair(self, params: Dict) -> Dict:
+        """Repair an existing timetable against a cached problem"""
+        problem = self.resolve_problem(params)
+        entries = [TimetableEntry(**entry) for entry in params.get("entries", [])]
+        change_set = ChangeSet(**params.get("change_set", {}))
+        change_set.added_subjects = [tuple(pair) for pair in change_set.added_subjects]
+
+        # Repair runs on its own seeded generator over the cached snapshot; the warm one keeps its timetable
+        generator = TimetableGenerator(params.get("seed"))
+        generator.load_snapshot(problem.snapshot)
+        generator.collect_timings = params.get("collect_timings", False)
+        generator.profile = params.get("profile", False)
+        result = generator.repair_timetable(
+            entries, change_set, time_limit=params.get("time_limit", self.default_time_limit)
+        )
+
+        return {
+            "problem_key": problem.key,
+            "entries": [asdict(entry) for entry in result.entries],
+            "fitness_score": result.fitness,
+            "complete": result.complete,
+            "kept_entries": result.kept_entries,
+            "changed_entries": result.changed_entries,
+            "removed_entries": result.removed_entries,
+            "metrics": asdict(result.metrics),
+        }
+
+    def submit(self, params: Dict) -> Dict:
+        """Queue a background generation job; its events are pushed as they happen"""
+        problem = self.resolve_problem(params)
+        optimizer_config = OptimizerConfig(**params["optimizer"]) if params.get("optimizer") else None
+        job_id = self.jobs.submit(
+            problem.snapshot, strategy=params.get("strategy", "mrv"), seed=params.get("seed"),
+            time_limit=params.get("time_limit", self.default_time_limit), optimizer_config=optimizer_config,
+            collect_timings=params.get("collect_timings", False), profile=params.get("profile", False),
+            backend=params.get("backend", "search")
+        )
+        return {"problem_key": problem.key, "job_id": job_id}
+
+    def job(self, params: Dict) -> Dict:
+        """Status of a job, its events from index since on, and its timetable once finished"""
+        job = self.jobs.get(params["job_id"])
+        result = {
+            "job_id": job.id,
+            "status": job.status.value,
+            "events": self.jobs.events(job.id, params.get("since", 0)),
+            "error": job.error,
+        }
+        if job.finished_at is not None:
+            result.update(
+                entries=[asdict(entry) for entry in job.entries],
+                fitness_score=job.fitness,
+                complete=job.complete,
+                metrics=asdict(job.metrics) if job.metrics else None,
+            )
+        return result
+
+    def cancel(self, params: Dict) -> Dict:
+        return {"cancelled": self.jobs.cancel(params["job_id"])}
+
+    def publish_job_event(self, job_id: str, event: Dict):
+        if self.notify:
+            self.notify({"job_id": job_id, "event": event})
+
+    def stats(self, params: Dict) -> Dict:
+        return {
+            "cached_problems": list(self.cache.problems),
+            "cached_catalogs": len(self.cache.catalogs),
+            "stored_options": sum(len(problem.options) for problem in self.cache.problems.values()),
+            "cached_solutions": len(self.solutions.keys()) if self.solutions else 0,
+            "hits": self.cache.hits,
+            "misses": self.cache.misses,
+            "queued_jobs": len(self.jobs.pending),
+            "running_jobs": len(self.jobs.running),
+        }
+
+    def evict(self, params: Dict) -> Dict:
+        return {"evicted": self.cache.evict(params.get("problem_key"))}
+
+def serve(service: SolverService, requests: TextIO, responses: TextIO):
+    """
+    Answer one JSON request per input line with one JSON response line
+    Job events are written as extra lines with a job_id instead of an id.
+    """
+    write_lock = threading.Lock()
+
+    def write(message: Dict):
+        with write_lock:
+            responses.write(json.dumps(message, default=str) + "\n")
+            responses.flush()
+
+    service.notify = write
+    for line in requests:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as error:
+            response = {"id": None, "error": f"Invalid JSON: {error}"}
+        else:
+            # Generator progress logs go to stderr so stdout carries only responses
+            with contextlib.redirect_stdout(sys.stderr):
+                response = service.handle(request)
+        write(response)
+    service.jobs.shutdown()
+
+def main():
+    """Run the solver service on stdin/stdout"""
+    cache_size = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    max_jobs = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    solution_dir = os.environ.get("TIMETABLE_SOLUTION_CACHE") or os.path.join(tempfile.gettempdir(), "timetable-solutions")
+    time_limit = float(os.environ.get("TIMETABLE_SOLVER_TIME_LIMIT") or 30.0)
+    print(
+        f"[v0] Timetable solver service ready (cache size {cache_size}, {max_jobs} job workers, "
+        f"solutions in {solution_dir}, {time_limit}s default time limit)",
+        file=sys.stderr,
+    )
+    service = SolverService(cache_size, max_jobs, solution_cache=SolutionCache(solution_dir), default_time_limit=time_limit)
+    serve(service, sys.stdin, sys.stdout)
+
+if __name__ == "__main__":
+    main()